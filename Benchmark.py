@@ -0,0 +1,241 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+import tracemalloc
+import multiprocessing
+from datetime import datetime, timezone
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT_DIR, "bulkuser", "src"))
+
+import SyntheticData
+
+SCALES = {
+    "small": {"users": 10_000, "studies": 200, "sites_per_study": 10},
+    "medium": {"users": 100_000, "studies": 1_000, "sites_per_study": 10},
+    "large": {"users": 1_000_000, "studies": 5_000, "sites_per_study": 20},
+}
+SIM_API_LIMIT = 10 ** 12
+
+
+# ─── Simulator Process ─────────────────────────────────────
+def _serve(data, latency, page_size, ready):
+    import VaultSimulator
+    # Limits far above any run's request count, so the client's rate limiter never paces the timings
+    simulator = VaultSimulator.VaultSimulator(data, port=0, latency=latency, jitter=0, page_size=page_size,
+                                              burst_limit=SIM_API_LIMIT, daily_limit=SIM_API_LIMIT)
+    ready.put(simulator.url)
+    simulator.server.serve_forever()
+
+
+@contextlib.contextmanager
+def simulator_process(data, latency, page_size):
+    """Run the Vault simulator in a child process so its allocations stay out of the memory profile."""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(data, latency, page_size, ready), daemon=True)
+    process.start()
+    try:
+        yield ready.get(timeout=60)
+    finally:
+        process.terminate()
+        process.join()
+
+
+# ─── Measurement ───────────────────────────────────────────
+def measure(name, records, run, setup=None, repeat=3, verbose=False):
+    """Time run(setup()) repeat times, then trace one more call for peak memory; setup is not measured."""
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    timings = []
+    with output:
+        for _ in range(repeat):
+            argument = setup() if setup else None
+            start = time.perf_counter()
+            run(argument)
+            timings.append(time.perf_counter() - start)
+
+        argument = setup() if setup else None
+        tracemalloc.start()
+        try:
+            run(argument)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    median = statistics.median(timings)
+    result = {
+        "name": name,
+        "records": records,
+        "repeat": repeat,
+        "seconds_min": min(timings),
+        "seconds_median": median,
+        "seconds_max": max(timings),
+        "records_per_second": records / median if median else None,
+        "peak_memory_bytes": peak,
+    }
+    print(f"⏱️ {name}: {median:.3f}s median, {result['records_per_second'] or 0:,.0f} records/s, "
+          f"peak {peak / 2 ** 20:,.1f} MiB")
+    return result
+
+
+# ─── Benchmarks ────────────────────────────────────────────
+def run_benchmarks(data, repeat, verbose):
+    """Run every benchmark in the current (scratch) directory and return the result dicts."""
+    import ExtractIO
+    import UserIndex
+    import validator
+    import ClinicalStudyList
+    import ClinicalStudyPerson
+    import ClindDataUserImport
+    import CDMS_UserList
+    import VaultSession
+
+    results = []
+    ctms = VaultSession.ctms()
+    study_query = ClinicalStudyList.build_query(ClinicalStudyList.FALLBACK_DATE)
+
+    # Extraction: paginated VQL against the simulator
+    results.append(measure("retrieve_CTMSStudyList", len(data["study__v"]),
+                           lambda _: list(ClinicalStudyList.iter_CTMSStudyList(ctms, study_query)), repeat=repeat, verbose=verbose))
+    results.append(measure("retrieve_CDMSusers", len(data["users"]),
+                           lambda _: CDMS_UserList.retrieve_CDMSusers(full=True), repeat=repeat, verbose=verbose))
+
+    # Transformation, on the extract files the scripts exchange
+    SyntheticData.write_files(data, ".")
+    organization_names = ExtractIO.read_extract("study_output.csv", columns=["organization_names"], dtype=str)["organization_names"]
+    results.append(measure("extract_organization_names", len(organization_names),
+                           lambda values: values.map(ClinicalStudyList.extract_organization_names),
+                           setup=lambda: organization_names, repeat=repeat, verbose=verbose))
+
+    persons = pd.DataFrame(data["study_person__clin"]).drop(columns=["previous_study_state__c"])
+
+    def transform(df):
+        df = ClinicalStudyPerson.mapper(df)
+        df = ClinicalStudyPerson.column_renamer(df)
+        return ClinicalStudyPerson.column_generate(df)
+
+    results.append(measure("ClinicalStudyPerson.transform", len(persons), transform, setup=persons.copy,
+                           repeat=repeat, verbose=verbose))
+
+    # Validation against the extracts in the scratch directory
+    template_file = os.path.abspath("user-import-template-24r2.csv")
+    for extract in ("cdms_user_list.csv", "ctms_user_list.csv"):
+        UserIndex.build(extract)
+    results.append(measure("validator.validate_import_template", len(persons),
+                           lambda _: validator.validate_import_template(template_file, "."), repeat=repeat, verbose=verbose))
+
+    # Import payload building, as ClindDataUserImport sends it
+    def build_payloads(_):
+        users = ClindDataUserImport.load_users(template_file)
+        chunk_size = ClindDataUserImport.CHUNK_SIZE
+        return [json.dumps({"append_site_country_access": True, "users": users[start:start + chunk_size]})
+                for start in range(0, len(users), chunk_size)]
+
+    results.append(measure("ClindDataUserImport.payloads", len(persons), build_payloads, repeat=repeat, verbose=verbose))
+    return results
+
+
+# ─── Regression Check ──────────────────────────────────────
+def compare(results, baseline_file, tolerance):
+    """Names of benchmarks whose median time grew by more than tolerance (a fraction) over the baseline."""
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = {result["name"]: result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(result["name"])
+        if not before or before["records"] != result["records"] or not before["seconds_median"]:
+            continue
+        change = result["seconds_median"] / before["seconds_median"] - 1
+        print(f"{'❌' if change > tolerance else '✅'} {result['name']}: {change:+.1%} vs baseline")
+        if change > tolerance:
+            regressions.append(result["name"])
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ─── Entry Point ───────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark extraction, transformation, validation and import payloads on synthetic data "
+                    "served by a local Vault simulator, and write the results as JSON.",
+    )
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (median is reported)")
+    parser.add_argument("--seed", type=int, default=42, help="synthetic data seed")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Vault latency per request, seconds")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--output", default=None, help="result file (default: benchmark-results/<scale>-<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline before failing")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the benchmarked code")
+    args = parser.parse_args(argv)
+
+    sizes = SCALES[args.scale]
+    started_at = datetime.now(timezone.utc)
+    output = os.path.abspath(args.output or os.path.join(
+        "benchmark-results", f"{args.scale}-{started_at.strftime('%Y%m%d-%H%M%S')}.json"))
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    print(f"🧪 Generating {args.scale} dataset: {sizes}")
+    data = SyntheticData.generate(**sizes, seed=args.seed)
+
+    with simulator_process(data, args.latency, args.page_size) as url, tempfile.TemporaryDirectory() as scratch:
+        # Point the scripts at the simulator before they read their settings. Redis
+        # goes to an unused port so real sessions and watermarks are never touched.
+        os.environ.update({
+            "CTMS_URL": url, "BASE_URL": url, "CTMS_API_VERSION": "v24.1", "API_VERSION": "v24.1",
+            "CLIENT_ID": "benchmark", "CLIENT_SECRET": "benchmark",
+            "REDIS_HOST": "127.0.0.1", "REDIS_PORT": os.getenv("BENCHMARK_REDIS_PORT", "1"),
+            "VAULT_CHECKPOINT_DIR": os.path.join(scratch, ".checkpoints"),
+            "REFERENCE_CACHE_DIR": os.path.join(scratch, ".reference_cache"),
+            "METRICS_REPORT": "false",
+        })
+        os.environ.setdefault("VAULT_MAX_RATE", "1000")
+        os.environ.setdefault("VAULT_RATE_BURST", "100")
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            results = run_benchmarks(data, args.repeat, args.verbose)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "scale": args.scale,
+        "sizes": sizes,
+        "seed": args.seed,
+        "latency": args.latency,
+        "page_size": args.page_size,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if baseline and compare(results, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
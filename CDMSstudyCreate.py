@@ -1,65 +1,53 @@
 import pandas as pd
 import requests
+import VaultClient
+import VaultSession
+import ExtractIO
+import Profiling
 import os
+import sys
 import time
 import csv
+import heapq
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # ─── Load Environment Variables ─────────────────────────────
 load_dotenv()
 VAULT_DOMAIN = os.getenv("BASE_URL")
 API_VERSION = os.getenv("API_VERSION")
-SESSION_FILE = "session_id.txt"
 STUDY_CSV = "study_output.csv"
 FAILURE_LOG = "cdms_study_failures.csv"
 ORGANIZATION_NAME = "Boehringer Ingelheim"
-DELAY_SECONDS = int(os.getenv("CDMS_DELAY", 5))
-
-
-# ─── Load CDMS Session ─────────────────────────────────────
-def load_session_id():
-    try:
-        with open(SESSION_FILE) as f:
-            session_id = f.read().strip()
-            if not session_id:
-                raise ValueError("Session ID file is empty.")
-            print("🔐 CDMS session loaded.")
-            return session_id
-    except Exception as e:
-        print(f"X Failed to load session ID: {e}")
-        return None
+DELAY_SECONDS = int(os.getenv("CDMS_DELAY", 0))
+CREATE_WORKERS = int(os.getenv("CDMS_CREATE_WORKERS", 1))
+VERIFY_DELAY = float(os.getenv("CDMS_VERIFY_DELAY", 2))
+VERIFY_ATTEMPTS = int(os.getenv("CDMS_VERIFY_ATTEMPTS", 6))
+INDEX_REFRESH_INTERVAL = float(os.getenv("CDMS_INDEX_REFRESH", 2))
 
 
 # ─── Check Session Validity ────────────────────────────────
 def is_session_valid(response):
     """Check if the API response indicates an expired session"""
-    if response.status_code == 401:
-        try:
-            json_resp = response.json()
-            if "errors" in json_resp and any(
-                    err.get("type") == "INVALID_SESSION_ID" for err in json_resp.get("errors", [])):
-                print("X ERROR: Session ID has expired. Please run CDMSAuth.py to refresh your session.")
-                return False
-        except:
-            pass
+    if VaultClient.is_invalid_session(response):
+        print("X ERROR: Session ID still rejected after re-authentication. Check CDMS credentials.")
+        return False
     return True
 
 
 # ─── Check Study Existence ─────────────────────────────────
-def study_exists(session_id, study_name):
+def study_exists(session, study_name):
     url = f"{VAULT_DOMAIN}/api/{API_VERSION}/app/cdm/design/study_masters"
     headers = {
-        "Authorization": f"Bearer {session_id}",
         "Accept": "application/json"  # This is needed to get JSON responses
     }
     params = {"study_master_name": study_name}
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-
-        # Print response for debugging
-        print(f"Study check response: {response.status_code}")
-        print(f"Response content: {response.text[:200]}...")  # Print first 200 chars
+        response = VaultClient.get(url, headers=headers, params=params, session_manager=session)
 
         # Check for session expiration using the shared function
         if not is_session_valid(response):
@@ -69,7 +57,6 @@ def study_exists(session_id, study_name):
             json_data = response.json()
             # The API returns study_masters array, not data array
             records = json_data.get("study_masters", [])
-            print(f"Found {len(records)} matching studies")
             return len(records) > 0, None
         else:
             print(f" Study check failed for '{study_name}': {response.status_code}")
@@ -79,20 +66,93 @@ def study_exists(session_id, study_name):
         return False, str(e)
     except ValueError as e:
         print(f" Error parsing JSON response: {e}")
-        print(f"Raw response: {response.text}")
         return False, str(e)
 
 
+# ─── Study Master Snapshot ─────────────────────────────────
+def list_study_masters(session):
+    """Fetch the names of every existing study master in one listing (following next_page links)."""
+    url = f"{VAULT_DOMAIN}/api/{API_VERSION}/app/cdm/design/study_masters"
+    headers = {
+        "Accept": "application/json"
+    }
+    names = set()
+
+    try:
+        while url:
+            response = VaultClient.get(url, headers=headers, session_manager=session)
+            if not is_session_valid(response):
+                return None, "SESSION_EXPIRED"
+            if response.status_code != 200:
+                print(f" Study master listing failed: {response.status_code}")
+                return None, f"HTTP {response.status_code}"
+
+            json_data = response.json()
+            for record in json_data.get("study_masters", []):
+                name = record.get("study_master_name") or record.get("name")
+                if name:
+                    names.add(name.strip())
+
+            next_page = json_data.get("responseDetails", {}).get("next_page")
+            url = f"{VAULT_DOMAIN}{next_page}" if next_page else None
+    except requests.exceptions.RequestException as e:
+        print(f" Error during study master listing: {e}")
+        return None, str(e)
+    except ValueError as e:
+        print(f" Error parsing study master listing: {e}")
+        return None, str(e)
+
+    return names, None
+
+
+class StudyMasterIndex:
+    """Cached set of existing study master names.
+
+    refresh() re-lists the study masters at most once per min_interval
+    seconds, so every study awaiting verification in the same round is
+    answered by a single listing call.
+    """
+
+    def __init__(self, session, min_interval=INDEX_REFRESH_INTERVAL):
+        self.session = session
+        self.min_interval = min_interval
+        self.names = set()
+        self.loaded = False
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and self.loaded and time.monotonic() - self._loaded_at < self.min_interval:
+                return None
+            names, error = list_study_masters(self.session)
+            if names is not None:
+                self.names = names
+                self.loaded = True
+                self._loaded_at = time.monotonic()
+            return error
+
+    def __contains__(self, name):
+        return name in self.names
+
+
+def skip_existing(studies, index):
+    for name, external_id, payload in studies:
+        if name in index:
+            print(f" Study '{name}' already exists in CDMS, skipping.")
+            continue
+        yield name, external_id, payload
+
+
 # ─── Submit Study Creation ─────────────────────────────────
-def create_study(session_id, payload):
+def create_study(session, payload):
     url = f"{VAULT_DOMAIN}/api/{API_VERSION}/app/cdm/design/actions/create_study"
     headers = {
-        "Authorization": f"Bearer {session_id}",
         "Content-Type": "application/json"
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = VaultClient.post(url, headers=headers, json=payload, session_manager=session)
 
         # Check for session expiration using the shared function
         if not is_session_valid(response):
@@ -111,32 +171,22 @@ def create_study(session_id, payload):
 
 
 # ─── Log Failures to CSV ───────────────────────────────────
-def log_failure(name, external_id, reason):
-    header_needed = not os.path.exists(FAILURE_LOG)
-    with open(FAILURE_LOG, mode="a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if header_needed:
-            writer.writerow(["study_master_name", "external_id", "reason"])
-        writer.writerow([name, external_id, reason])
+_failure_lock = threading.Lock()
 
 
-# ─── Main Workflow ─────────────────────────────────────────
-def process_study_list():
-    session_id = load_session_id()
-    if not session_id:
-        return
-
-    if not os.path.exists(STUDY_CSV):
-        print(f" Missing CSV file: {STUDY_CSV}")
-        return
-
-    df = pd.read_csv(STUDY_CSV)
-    required_fields = {"name__v", "external_id__v", "global_id__sys"}
-    # required_fields = {"name__v", "external_id__v", "status__v", "global_id__sys"}
-    if not required_fields.issubset(df.columns):
-        print(" CSV is missing required headers.")
-        return
-
+def log_failure(name, external_id, reason):
+    with _failure_lock:
+        header_needed = not os.path.exists(FAILURE_LOG)
+        with open(FAILURE_LOG, mode="a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if header_needed:
+                writer.writerow(["study_master_name", "external_id", "reason"])
+            writer.writerow([name, external_id, reason])
+
+
+# ─── Read Study Rows ───────────────────────────────────────
+def iter_study_rows(df):
+    """Yield (name, external_id, payload) per usable row, logging rows that are skipped."""
     for i, row in df.iterrows():
         name = str(row["name__v"]).strip() if pd.notna(row["name__v"]) else ""
         external_id = str(row["external_id__v"]).strip() if pd.notna(row["external_id__v"]) else ""
@@ -152,32 +202,166 @@ def process_study_list():
             "organization_name": ORGANIZATION_NAME,
             "external_id": external_id
         }
+        yield name, external_id, payload
 
-        # Submit creation request
-        submitted, error = create_study(session_id, payload)
-        if error == "SESSION_EXPIRED":
-            print(" Processing stopped: Session expired. Please refresh your session.")
-            break
 
-        time.sleep(3)  # Allow backend time to register study
+# ─── Parallel Creation ─────────────────────────────────────
+def verify_studies(session, index, pending, stop_event):
+    """Confirm submitted studies from the pending queue, polling with exponential backoff.
+
+    Queue items are (name, external_id, submitted); a None item means no more
+    submissions are coming. Studies whose creation request failed get a single
+    check, in case they already existed. On an unexpected error stop_event is
+    set, every study still queued or scheduled is logged as a failure, and the
+    error is re-raised once the None item has arrived.
+    """
+    schedule = []
+    due = []
+    order = itertools.count()
+    submissions_done = False
 
-        # Confirm registration
-        exists, error = study_exists(session_id, name)
+    try:
+        while not submissions_done or schedule:
+            timeout = max(0.0, schedule[0][0] - time.monotonic()) if schedule else None
+            try:
+                item = pending.get(timeout=timeout)
+                if item is None:
+                    submissions_done = True
+                else:
+                    name, external_id, submitted = item
+                    heapq.heappush(schedule, (time.monotonic() + VERIFY_DELAY, next(order), name, external_id, submitted, VERIFY_DELAY, 1))
+                continue
+            except queue.Empty:
+                pass
+
+            # Everything due now is checked against one fresh listing
+            due = [heapq.heappop(schedule)]
+            while schedule and schedule[0][0] <= time.monotonic():
+                due.append(heapq.heappop(schedule))
+            listing_error = index.refresh()
+            if listing_error == "SESSION_EXPIRED":
+                stop_event.set()
+
+            while due:
+                _, _, name, external_id, submitted, delay, attempt = due[0]
+                if not listing_error:
+                    exists = name in index
+                elif stop_event.is_set():
+                    exists = False
+                else:
+                    exists, error = study_exists(session, name)
+                    if error == "SESSION_EXPIRED":
+                        stop_event.set()
+
+                if exists:
+                    print(f" Verified: Study '{name}' exists in CDMS.")
+                elif submitted and attempt < VERIFY_ATTEMPTS and not stop_event.is_set():
+                    delay *= 2
+                    heapq.heappush(schedule, (time.monotonic() + delay, next(order), name, external_id, submitted, delay, attempt + 1))
+                else:
+                    if not submitted:
+                        reason = "Creation request failed"
+                    elif stop_event.is_set():
+                        reason = "Verification aborted (session expired)"
+                    else:
+                        reason = "Created but not found"
+                    print(f" {reason} → logging failure.")
+                    log_failure(name, external_id, reason)
+                due.pop(0)
+    except Exception as e:
+        stop_event.set()
+        reason = f"Verification aborted ({e})"
+        print(f" {reason} → logging failure for every unverified study.")
+        for _, _, name, external_id, _, _, _ in due + schedule:
+            log_failure(name, external_id, reason)
+        while not submissions_done:
+            item = pending.get()
+            if item is None:
+                submissions_done = True
+            else:
+                log_failure(item[0], item[1], reason)
+        raise
+
+
+def process_studies(session, studies, index):
+    """Submit creations on CREATE_WORKERS threads while a separate thread verifies them.
+
+    Request pacing comes from VaultClient's shared rate limiter, plus an
+    optional DELAY_SECONDS pause after each submission. Returns False when
+    the session expired before every study was handled; an error in the
+    verifier is re-raised once the submissions have finished.
+    """
+    pending = queue.Queue()
+    stop_event = threading.Event()
+
+    def submit(study):
+        name, external_id, payload = study
+        if stop_event.is_set():
+            return
+        submitted, error = create_study(session, payload)
         if error == "SESSION_EXPIRED":
             print(" Processing stopped: Session expired. Please refresh your session.")
-            break
+            stop_event.set()
+            return
+        pending.put((name, external_id, submitted))
+        time.sleep(DELAY_SECONDS)
 
-        if exists:
-            print(f" Verified: Study '{name}' exists in CDMS.")
-        else:
-            reason = "Created but not found" if submitted else "Creation request failed"
-            print(f" {reason} → logging failure.")
-            log_failure(name, external_id, reason)
-            continue
+    with ThreadPoolExecutor(max_workers=1) as verifier_pool:
+        verifier = verifier_pool.submit(verify_studies, session, index, pending, stop_event)
+        try:
+            with ThreadPoolExecutor(max_workers=CREATE_WORKERS) as executor:
+                list(executor.map(submit, studies))
+        finally:
+            pending.put(None)
+        verifier.result()
+    return not stop_event.is_set()
+
+
+# ─── Main Workflow ─────────────────────────────────────────
+@Profiling.profiled("create-studies")
+def process_study_list(df=None):
+    """Create the studies in df, or in the STUDY_CSV extract when no DataFrame is given.
+
+    Returns True when every study was handled (failed creations are logged
+    to FAILURE_LOG) and False when the run could not start or the session
+    expired.
+    """
+    session = VaultSession.cdms()
+    try:
+        session.get_session_id()
+        print("🔐 CDMS session loaded.")
+    except Exception as e:
+        print(f"X Failed to load session ID: {e}")
+        return False
+
+    if df is None:
+        if not ExtractIO.find_extract(STUDY_CSV):
+            print(f" Missing CSV file: {STUDY_CSV}")
+            return False
+        df = ExtractIO.read_extract(STUDY_CSV)
+
+    required_fields = {"name__v", "external_id__v", "global_id__sys"}
+    # required_fields = {"name__v", "external_id__v", "status__v", "global_id__sys"}
+    if not required_fields.issubset(df.columns):
+        print(" CSV is missing required headers.")
+        return False
+
+    # One listing up front lets reruns skip studies that already exist
+    index = StudyMasterIndex(session)
+    error = index.refresh(force=True)
+    if error == "SESSION_EXPIRED":
+        print(" Processing stopped: Session expired. Please refresh your session.")
+        return False
+    if error:
+        print(f" Could not list existing studies ({error}); no studies will be skipped.")
 
-        time.sleep(DELAY_SECONDS)  # Respect pacing
+    studies = skip_existing(iter_study_rows(df), index)
+    return process_studies(session, studies, index)
 
 
 # ─── Entry Point ───────────────────────────────────────────
 if __name__ == "__main__":
-    process_study_list()
\ No newline at end of file
+    if "--profile" in sys.argv:
+        Profiling.enable()
+    if not process_study_list():
+        exit(1)
\ No newline at end of file
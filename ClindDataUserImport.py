@@ -1,86 +1,135 @@
 import os
+import sys
 import json
 import pandas as pd
 import requests
-import redis
+import VaultClient
+import VaultSession
+import Profiling
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # ─── Load Environment Variables ─────────────────────────────
 load_dotenv()
 API_VERSION = os.getenv("API_VERSION")
 BASE_URL = os.getenv("BASE_URL")
+TEMPLATE_PATH = os.getenv("USER_IMPORT_TEMPLATE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "user-import-template-24r2.csv"))
+CHUNK_SIZE = int(os.getenv("USER_IMPORT_CHUNK_SIZE", 200))
+IMPORT_WORKERS = int(os.getenv("USER_IMPORT_WORKERS", 4))
+RESULTS_CSV = "user_import_results.csv"
+SESSION = VaultSession.cdms()
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
-REDIS_SESSION_KEY = "CDMS:session_id"
-SESSION_FILE = "CDMSsession_id.txt"
 
-# ─── Load Session ID from Redis or Fallback to File ─────────
-def load_session_id():
+# ─── Load User Data from CSV ────────────────────────────────
+def load_users(template_path=TEMPLATE_PATH):
+    df = pd.read_csv(template_path)
+    df = df.fillna("")
+    return df.to_dict("records")
+
+
+# ─── Prepare Payload and Send Request ───────────────────────
+def post_users(users, session=SESSION):
+    """Send one users_json request and return (ok, error, response_json).
+
+    response_json is None when the request itself failed (connection error,
+    timeout, non-2xx status or a body that is not JSON); otherwise Vault
+    answered and any error is about the submitted users.
+    """
+    payload = {
+        "append_site_country_access": True,
+        "users": users
+    }
+
+    url = f"{BASE_URL}/api/{API_VERSION}/app/cdm/users_json"
+    headers = {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+    }
+
     try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, socket_connect_timeout=3)
-        session_id = r.get(REDIS_SESSION_KEY)
-        if session_id:
-            print("✅ Session ID loaded from Redis.")
-            return session_id.decode()
-        else:
-            print("⚠️ Redis key not found. Falling back to file.")
-    except Exception as e:
-        print(f"⚠️ Redis unavailable: {e}. Falling back to file.")
+        response = VaultClient.post(url, headers=headers, data=json.dumps(payload), session_manager=session)
+        response.raise_for_status()
+        response_json = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return False, str(e), None
+
+    if response_json.get("responseStatus", "SUCCESS") != "SUCCESS":
+        return False, json.dumps(response_json.get("errors", response_json)), response_json
+    return True, None, response_json
+
+
+def import_chunk(start, users, session=SESSION):
+    """Import users (template rows start..) and return one result per request that settled them.
 
+    When Vault rejects the submitted users, the chunk is bisected until the
+    failing rows are isolated. A chunk whose request failed (connection error,
+    timeout, 5xx) is recorded as failed as a whole and not posted again, since
+    Vault may already have applied it.
+    """
+    ok, error, response_json = post_users(users, session)
+    first_row, last_row = start + 2, start + len(users) + 1
+    if ok:
+        print(f"✅ Rows {first_row}-{last_row}: {len(users)} user(s) imported.")
+        return [{"first_row": first_row, "last_row": last_row, "users": len(users), "status": "SUCCESS", "error": "",
+                 "response": json.dumps(response_json)}]
+    if len(users) == 1 or response_json is None:
+        print(f"❌ Rows {first_row}-{last_row}: import failed: {error}")
+        return [{"first_row": first_row, "last_row": last_row, "users": len(users), "status": "FAILURE", "error": error,
+                 "response": json.dumps(response_json) if response_json is not None else ""}]
+
+    print(f"⚠️ Rows {first_row}-{last_row} rejected ({error}); splitting the chunk.")
+    middle = len(users) // 2
+    return import_chunk(start, users[:middle], session) + import_chunk(start + middle, users[middle:], session)
+
+
+def import_users(users, session=SESSION, chunk_size=CHUNK_SIZE, max_workers=IMPORT_WORKERS):
+    """Import users in chunks submitted concurrently and return the per-chunk results.
+
+    Request pacing comes from VaultClient's shared rate limiter. Results are
+    also written to RESULTS_CSV.
+    """
+    chunks = [(start, users[start:start + chunk_size]) for start in range(0, len(users), chunk_size)]
+    print(f"📤 Importing {len(users)} user(s) in {len(chunks)} chunk(s) of up to {chunk_size}.")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = [result for chunk_results in executor.map(lambda chunk: import_chunk(*chunk, session), chunks)
+                   for result in chunk_results]
+
+    pd.DataFrame(results).to_csv(RESULTS_CSV, index=False)
+    imported = sum(result["users"] for result in results if result["status"] == "SUCCESS")
+    failed = sum(result["users"] for result in results if result["status"] != "SUCCESS")
+    print(f"✅ Import finished: {imported} imported, {failed} failed (details in {RESULTS_CSV}).")
+    return results
+
+
+# ─── Main Execution ─────────────────────────────────────────
+@Profiling.profiled("import-users")
+def main(users_to_import=None):
+    """Import users_to_import, or the rows of the import template when none are given.
+
+    Returns True when every user was imported (or there were none to import).
+    """
     try:
-        with open(SESSION_FILE) as f:
-            session_id = f.read().strip()
-            if session_id:
-                print("✅ Session ID loaded from file.")
-                return session_id
-            else:
-                print("❌ Session ID file is empty.")
+        SESSION.get_session_id()
     except Exception as e:
-        print(f"❌ Failed to load session ID from file: {e}")
-    return None
+        print(f"❌ No valid session ID: {e}. Aborting.")
+        return False
 
-# ─── Load Session ID ────────────────────────────────────────
-SESSION_ID = load_session_id()
-if not SESSION_ID:
-    print("❌ No valid session ID. Aborting.")
-    exit(1)
+    if users_to_import is None:
+        try:
+            users_to_import = load_users()
+        except Exception as e:
+            print(f"❌ Error reading CSV: {e}")
+            return False
 
-# ─── Load User Data from CSV ────────────────────────────────
-dir = os.path.dirname(os.path.abspath(__file__))
-template_path = os.path.join(dir, "user-import-template-24r2.csv")
+    if not users_to_import:
+        print("⚠️ No users found in the template.")
+        return True
 
-try:
-    df = pd.read_csv(template_path)
-    df = df.fillna("")
-except Exception as e:
-    print(f"❌ Error reading CSV: {e}")
-    exit(1)
+    results = import_users(users_to_import)
+    return all(result["status"] == "SUCCESS" for result in results)
 
-users_to_import = [row.to_dict() for _, row in df.iterrows()]
-if not users_to_import:
-    print("⚠️ No users found in the template.")
-    exit(0)
 
-# ─── Prepare Payload and Send Request ───────────────────────
-payload = {
-    "append_site_country_access": True,
-    "users": users_to_import
-}
-print(json.dumps(payload, indent=4))
-
-url = f"{BASE_URL}/api/{API_VERSION}/app/cdm/users_json"
-headers = {
-    "Accept": "application/json",
-    "Content-Type": "application/json",
-    "Authorization": f"Bearer {SESSION_ID}"
-}
-
-try:
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
-    response.raise_for_status()
-    print("✅ Import response:")
-    print(json.dumps(response.json(), indent=4))
-except requests.exceptions.RequestException as e:
-    print(f"❌ Import failed: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    if "--profile" in sys.argv:
+        Profiling.enable()
+    exit(0 if main() else 1)
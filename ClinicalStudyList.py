@@ -1,10 +1,16 @@
 import json
 import os
+import sys
 import requests
+import VaultClient
+import Metrics
+import Profiling
+import ExtractIO
+import VaultSession
+import PageCheckpoint
 import pandas as pd
 from dotenv import load_dotenv
-import ast
-import redis
+import RedisStore
 import logging
 from datetime import datetime
 
@@ -12,15 +18,10 @@ from datetime import datetime
 load_dotenv()
 CTMS_API_VERSION = os.getenv("CTMS_API_VERSION")
 CTMS_URL = os.getenv("CTMS_URL")
-REDIS_SESSION_KEY = "CTMS:session_id"
-SESSION_FILE = "CTMSsession_id.txt"
 OUTPUT_CSV = os.getenv("CTMS_STUDY_CSV") or "ctms_study_list.csv"
 # PROCESSED_CSV = "processed_studies.csv"
 FALLBACK_DATE = os.getenv("CTMS_FALLBACK_DATE", "2000-01-01T00:00:00.000Z")
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
 REDIS_KEY = "ctms:last_modified_date"
 
 # ─── Logging Setup ──────────────────────────────────────────
@@ -35,12 +36,8 @@ logger = logging.getLogger()
 # ─── Redis Utilities ───────────────────────────────────────
 def get_last_modified_date():
     try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, socket_connect_timeout=3)
-        if not r.ping():
-            raise ConnectionError("Redis ping failed.")
-        value = r.get(REDIS_KEY)
-        if value:
-            date_str = value.decode()
+        date_str = RedisStore.get(REDIS_KEY)
+        if date_str:
             logger.info(f"Last modified date from Redis: {date_str}")
             print(f"🕒 Last modified date from Redis: {date_str}")
             return date_str
@@ -58,8 +55,7 @@ def update_last_modified_date(df):
     try:
         latest_date = df['modified_date__v'].dropna().max()
         if latest_date:
-            r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
-            r.set(REDIS_KEY, latest_date)
+            RedisStore.set_many({REDIS_KEY: latest_date})
             logger.info(f"Updated Redis with latest modified_date__v: {latest_date}")
             print(f"✅ Updated Redis with latest modified_date__v: {latest_date}")
     except Exception as e:
@@ -74,100 +70,87 @@ def build_query(modified_date):
     modified_date__v
     FROM study__v
     WHERE (connect_to_vault_cdms__v = false) AND (state__v = 'active_state__v') AND ((milestone_master_set__v = 'OOW000000004010') OR (milestone_master_set__v = 'OOW000000000201') OR (milestone_master_set__v = 'OOW000000004001')) AND (external_id__v = null) AND (modified_date__v > '{modified_date}')
+    ORDER BY id ASC
     """
 
-# ─── Load Session ID ────────────────────────────────────────
-def load_session_id():
-    # Try Redis first
-    try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, socket_connect_timeout=3)
-        session_id = r.get(REDIS_SESSION_KEY)
-        if session_id:
-            print("✅ Session ID loaded from Redis.")
-            return session_id.decode()
-        else:
-            print("⚠️ Redis key not found. Falling back to file.")
-    except Exception as e:
-        print(f"⚠️ Redis unavailable: {e}. Falling back to file.")
-
-    # Fallback to file
-    try:
-        with open(SESSION_FILE) as f:
-            session_id = f.read().strip()
-            if session_id:
-                print("✅ Session ID loaded from file.")
-                return session_id
-            else:
-                print("❌ Session ID file is empty.")
-    except Exception as e:
-        print(f"❌ Failed to load session ID from file: {e}")
-
-    return None
-
 # ─── Extract Organization Names ─────────────────────────────
 def extract_organization_names(value):
     try:
-        if isinstance(value, str):
-            value = ast.literal_eval(value)
-        if isinstance(value, dict):
-            orgs = value.get("data", [])
-            names = [org.get("organization__vr.name__v") for org in orgs if "organization__vr.name__v" in org]
-            return ", ".join(names) if names else None
-        return None
+        orgs = ExtractIO.parse_subquery(value)
+        names = [org.get("organization__vr.name__v") for org in orgs if "organization__vr.name__v" in org]
+        return ", ".join(names) if names else None
     except Exception as e:
         logger.warning(f"Failed to extract organization names: {e}")
         print(f"⚠️ Failed to extract organization names: {e}")
         return None
 
+# ─── Classify Study Type ────────────────────────────────────
+def classify_study_type(org_name):
+    if not org_name or org_name.strip() == "":
+        return ""
+    org_name_lower = org_name.lower()
+    if "almac clinical technologies llc" in org_name_lower or "nanavati" in org_name_lower:
+        return "IRT study"
+    return "Non IRT study"
+
+def classify_organizations(df):
+    if 'organization_names' in df.columns:
+        df['organization_names'] = df['organization_names'].apply(extract_organization_names)
+        df['organization_names'] = df['organization_names'].replace(["[]", "null", None], "")
+        df['organization_names'] = df['organization_names'].apply(classify_study_type)
+    return df
+
 # ─── Query Study Records ────────────────────────────────────
-def retrieve_CTMSStudyList(session_id, query_str):
-    studies = []
+def iter_CTMSStudyList(session, query_str, checkpoint=None):
+    """Yield study records as their pages arrive; raises after logging any API or network error."""
     base_url = f"{CTMS_URL}/api/{CTMS_API_VERSION}/query"
     headers = {
         "Content-Type": "application/x-www-form-urlencoded",
         "Accept": "application/json",
         "X-VaultAPI-DescribeQuery": "true",
-        "Authorization": f"Bearer {session_id}"
     }
     payload = {"q": query_str}
-    url = base_url
 
     print("📡 Fetching studies from ClinOps Vault...")
     try:
-        while url:
-            response = requests.post(url, data=payload, headers=headers) if url == base_url else requests.get(url, headers=headers)
+        response = VaultClient.post(base_url, data=payload, headers=headers, session_manager=session, idempotent=True)
 
-            if response.status_code == 401:
-                json_resp = response.json()
-                if "errors" in json_resp and any(err.get("type") == "INVALID_SESSION_ID" for err in json_resp.get("errors", [])):
-                    print("❌ Session ID expired. Run CTMSAuth.py to refresh.")
-                    logger.warning("Session ID expired.")
-                    return pd.DataFrame()
+        if VaultClient.is_invalid_session(response):
+            print("❌ Session ID still rejected after re-authentication. Check CTMS credentials.")
+            logger.warning("Session ID rejected after re-authentication.")
+            raise RuntimeError("Session ID expired.")
 
-            if response.status_code != 200:
-                print(f"❌ API error {response.status_code}: {response.text}")
-                logger.error(f"API error {response.status_code}: {response.text}")
-                break
+        if response.status_code != 200:
+            print(f"❌ API error {response.status_code}: {response.text}")
+            logger.error(f"API error {response.status_code}: {response.text}")
+            raise RuntimeError(f"API error {response.status_code}")
 
-            json_response = response.json()
+        json_response = response.json()
+        Metrics.record_page()
 
-            if "errors" in json_response:
-                print(f"❌ API returned an error: {json_response['errors']}")
-                logger.error(f"API returned an error: {json_response['errors']}")
-                if len(studies) == 0:
-                    return pd.DataFrame()
-                break
+        if "errors" in json_response:
+            print(f"❌ API returned an error: {json_response['errors']}")
+            logger.error(f"API returned an error: {json_response['errors']}")
+            raise RuntimeError("API returned an error.")
 
-            studies.extend(json_response.get("data", []))
+        yield from json_response.get("data", [])
 
-            next_page = json_response.get("responseDetails", {}).get("next_page")
-            url = f"{CTMS_URL}{next_page}" if next_page else None
-            payload = None
+        # Remaining pages are fetched concurrently and come back in page order
+        for page in VaultClient.iter_remaining_pages(CTMS_URL, headers, json_response, session_manager=session, checkpoint=checkpoint):
+            if "errors" in page:
+                print(f"❌ API returned an error: {page['errors']}")
+                logger.error(f"API returned an error: {page['errors']}")
+                raise RuntimeError("API returned an error.")
+            yield from page.get("data", [])
 
     except requests.exceptions.RequestException as e:
         print(f"❌ Network error: {e}")
         logger.error(f"Network error: {e}")
-        return pd.DataFrame()
+        raise
+
+def retrieve_CTMSStudyList(session, query_str):
+    try:
+        studies = list(iter_CTMSStudyList(session, query_str))
     except Exception as e:
         print(f"❌ Error retrieving studies: {e}")
         logger.error(f"Error retrieving studies: {e}")
@@ -179,58 +162,84 @@ def retrieve_CTMSStudyList(session_id, query_str):
     return pd.DataFrame(studies)
 
 # ─── Save Study List to CSV ────────────────────────────
-def save_studies_to_csv(df, output_file):
-    df.to_csv(output_file, index=False)
-    print(f"✅ Saved {len(df)} studies to {output_file}")
-    logger.info(f"Saved {len(df)} studies to {output_file}")
+def save_studies_to_csv(chunks, output_file):
+    """Write study DataFrame chunks to output_file incrementally and return the row count."""
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    total = ExtractIO.write_extract(chunks, output_file)
+    if total:
+        print(f"✅ Saved {total} studies to {ExtractIO.extract_path(output_file)}")
+        logger.info(f"Saved {total} studies to {ExtractIO.extract_path(output_file)}")
+    return total
 
 # ─── Main Execution ─────────────────────────────────────────
-def main():
+@Profiling.profiled("extract")
+def main(keep=False):
+    """Run the incremental study sync.
+
+    Returns False on failure and None when there are no new studies; otherwise
+    True, or with keep=True the classified studies as a DataFrame.
+    """
     logger.info("🔄 CTMS sync started.")
     print("🔄 CTMS sync started.")
 
-    # Load session ID
-    session_id = load_session_id()
-    if not session_id:
-        print("❌ No valid session ID. Run CTMSAuth.py.")
-        logger.error("No valid session ID. Aborting.")
-        return
+    # Read the session and the watermark from Redis in a single round-trip
+    session = VaultSession.ctms()
+    try:
+        RedisStore.prefetch(*session.redis_keys(), REDIS_KEY)
+    except Exception as e:
+        logger.error(f"Redis unavailable: {e}")
+
+    # Load (or re-authenticate) the CTMS session
+    try:
+        session.get_session_id()
+    except Exception as e:
+        print(f"❌ No valid session ID: {e}")
+        logger.error(f"No valid session ID. Aborting: {e}")
+        return False
 
     # Get last modified date from Redis
     modified_date = get_last_modified_date()
     query_str = build_query(modified_date)
 
-    # Retrieve studies from CTMS
-    all_studies_df = retrieve_CTMSStudyList(session_id, query_str)
-    if all_studies_df.empty:
-        print("⚠️ No studies found or unable to retrieve.")
-        logger.warning("No studies retrieved.")
-        return
+    # Retrieve, classify and save studies chunk by chunk; pages are checkpointed so a rerun resumes
+    checkpoint = PageCheckpoint.PageCheckpoint("ctms_study_list", query_str)
+    latest_dates = []
+    kept_chunks = []
 
-    # Extract and classify organization names
-    if 'organization_names' in all_studies_df.columns:
-        print("🔍 Classifying organization names...")
-        all_studies_df['organization_names'] = all_studies_df['organization_names'].apply(extract_organization_names)
-        all_studies_df['organization_names'] = all_studies_df['organization_names'].replace(["[]", "null", None], "")
+    def classified_chunks():
+        for chunk in ExtractIO.iter_record_chunks(iter_CTMSStudyList(session, query_str, checkpoint)):
+            chunk = classify_organizations(chunk)
+            if 'modified_date__v' in chunk.columns:
+                latest_dates.append(chunk['modified_date__v'].dropna().max())
+            if keep:
+                kept_chunks.append(chunk)
+            yield chunk
 
-        def classify_study_type(org_name):
-            if not org_name or org_name.strip() == "":
-                return ""
-            org_name_lower = org_name.lower()
-            if "almac clinical technologies llc" in org_name_lower or "nanavati" in org_name_lower:
-                return "IRT study"
-            return "Non IRT study"
-
-        all_studies_df['organization_names'] = all_studies_df['organization_names'].apply(classify_study_type)
+    try:
+        total = save_studies_to_csv(classified_chunks(), OUTPUT_CSV)
+    except Exception as e:
+        print(f"❌ Error retrieving studies: {e}")
+        logger.error(f"Error retrieving studies: {e}")
+        return False
 
-    # Save to CSV
-    save_studies_to_csv(all_studies_df, OUTPUT_CSV)
+    if not total:
+        print("⚠️ No new studies found.")
+        logger.warning("No studies retrieved.")
+        return
 
     # Update Redis with latest modified_date__v
-    update_last_modified_date(all_studies_df)
+    update_last_modified_date(pd.DataFrame({"modified_date__v": latest_dates}))
+    checkpoint.clear()
 
     print("✅ CTMS sync completed.")
     logger.info("✅ CTMS sync completed.")
+    if keep:
+        return pd.concat(kept_chunks, ignore_index=True)
+    return True
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--profile" in sys.argv:
+        Profiling.enable()
+    if main() is False:
+        exit(1)
\ No newline at end of file
@@ -1,8 +1,13 @@
 import os
+import sys
 import json
-import requests
+import VaultClient
+import VaultSession
+import PageCheckpoint
+import ExtractIO
+import Profiling
 import pandas as pd
-import redis
+import RedisStore
 from dotenv import load_dotenv
 
 # ─── Load Environment Variables ─────────────────────────────
@@ -11,48 +16,17 @@ CTMS_API_VERSION = os.getenv("CTMS_API_VERSION")
 CTMS_URL = os.getenv("CTMS_URL")
 CLIENT_ID = os.getenv("CLIENT_ID")
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
-REDIS_SESSION_KEY = "ctms:session_id"
 REDIS_MODIFIED_KEY = "ctms:last_modified_person"
-SESSION_FILE = "CTMSsession_id.txt"
 FALLBACK_DATE = os.getenv("CTMS_FALLBACK_DATE", "2000-01-01T00:00:00.000Z")
 
 
-# ─── Redis + File Fallback Utilities ────────────────────────
-def load_session_id():
-    try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, socket_connect_timeout=3)
-        session_id = r.get(REDIS_SESSION_KEY)
-        if session_id:
-            print("✅ Session ID loaded from Redis.")
-            return session_id.decode()
-        else:
-            print("⚠️ Redis key not found. Falling back to file.")
-    except Exception as e:
-        print(f"⚠️ Redis unavailable: {e}. Falling back to file.")
-
-    try:
-        with open(SESSION_FILE) as f:
-            session_id = f.read().strip()
-            if session_id:
-                print("✅ Session ID loaded from file.")
-                return session_id
-            else:
-                print("❌ Session ID file is empty.")
-    except Exception as e:
-        print(f"❌ Failed to load session ID from file: {e}")
-    return None
-
-
+# ─── Redis Utilities ────────────────────────────────────────
 def get_last_modified_date():
     try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
-        value = r.get(REDIS_MODIFIED_KEY)
+        value = RedisStore.get(REDIS_MODIFIED_KEY)
         if value:
-            print(f"🕒 Last modified date from Redis: {value.decode()}")
-            return value.decode()
+            print(f"🕒 Last modified date from Redis: {value}")
+            return value
         else:
             print("⚠️ No last modified date found in Redis. Using fallback.")
             return FALLBACK_DATE
@@ -67,24 +41,15 @@ def update_last_modified_date(df):
     try:
         latest_date = df['modified_date__v'].dropna().max()
         if latest_date:
-            r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
-            r.set(REDIS_MODIFIED_KEY, latest_date)
+            RedisStore.set_many({REDIS_MODIFIED_KEY: latest_date})
             print(f"✅ Updated Redis with latest modified_date__v: {latest_date}")
     except Exception as e:
         print(f"❌ Failed to update Redis: {e}")
 
 
 # ─── CTMS Query ─────────────────────────────────────────────
-def retrieve_Study_Person_details(session_id, modified_date):
-    users = []
-    base_url = f"{CTMS_URL}/api/{CTMS_API_VERSION}/query"
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Accept": "application/json",
-        "X-VaultAPI-DescribeQuery": "true",
-        "Authorization": f"Bearer {session_id}"
-    }
-    query = f"""
+def build_query(modified_date):
+    return f"""
     SELECT email__clin, name__v , last_name__v, first_name__v, person_type__cr.name__v, team_role__vr.name__v, site_connect_user__v, study__clinr.name__v, study__clinr.status__v, study_country__clinr.name__v, site__clinr.name__v, start_date__clin, end_date__clin, state__v, modified_date__v
     FROM study_person__clin
     WHERE 
@@ -98,21 +63,27 @@ def retrieve_Study_Person_details(session_id, modified_date):
         team_role__vr.name__v = 'Study Nurse' OR
         team_role__vr.name__v = 'Subinvestigator'
       ) AND modified_date__v > '{modified_date}'
+    ORDER BY id ASC
     """
+
+
+def iter_Study_Person_records(session, modified_date, checkpoint=None):
+    """Yield study person records as their pages arrive."""
+    base_url = f"{CTMS_URL}/api/{CTMS_API_VERSION}/query"
+    headers = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Accept": "application/json",
+        "X-VaultAPI-DescribeQuery": "true",
+    }
+    query = build_query(modified_date)
     payload = {"q": query}
-    url = base_url
 
-    while url:
-        response = requests.post(url, data=payload, headers=headers) if url == base_url else requests.get(url,
-                                                                                                          headers=headers)
-        response.raise_for_status()
-        json_response = response.json()
-        users.extend(json_response.get("data", []))
-        next_page = json_response.get("responseDetails", {}).get("next_page")
-        url = CTMS_URL + next_page if next_page else None
-        payload = None
+    for json_response in VaultClient.iter_query_pages(CTMS_URL, base_url, headers, payload, session_manager=session, checkpoint=checkpoint):
+        yield from json_response.get("data", [])
+
 
-    return pd.DataFrame(users)
+def retrieve_Study_Person_details(session, modified_date, checkpoint=None):
+    return pd.DataFrame(list(iter_Study_Person_records(session, modified_date, checkpoint)))
 
 
 # ─── Transformation Utilities ───────────────────────────────
@@ -196,21 +167,47 @@ def column_generate(df):
 
 
 # ─── Main Execution ─────────────────────────────────────────
-if __name__ == "__main__":
-    session_id = load_session_id()
-    if not session_id:
-        print("❌ No valid session ID. Aborting.")
-        exit(1)
+@Profiling.profiled("extract-persons")
+def main():
+    """Export new study persons as user import rows and return them.
+
+    Returns None when there are no new persons and False when no session
+    could be obtained.
+    """
+    # Read the session and the watermark from Redis in a single round-trip
+    session = VaultSession.ctms()
+    try:
+        RedisStore.prefetch(*session.redis_keys(), REDIS_MODIFIED_KEY)
+    except Exception as e:
+        print(f"⚠️ Redis unavailable: {e}")
+
+    try:
+        session.get_session_id()
+    except Exception as e:
+        print(f"❌ No valid session ID: {e}. Aborting.")
+        return False
 
     modified_date = get_last_modified_date()
-    users_df = retrieve_Study_Person_details(session_id, modified_date)
+    checkpoint = PageCheckpoint.PageCheckpoint("study_person_list", build_query(modified_date))
+    users_df = retrieve_Study_Person_details(session, modified_date, checkpoint)
 
     if users_df.empty:
         print("✅ No new study person records to process.")
     else:
+        # column_generate drops modified_date__v, so the watermark is taken from the raw records
+        latest_dates = users_df.reindex(columns=["modified_date__v"])
         mapped_users_df = mapper(users_df)
         mapped_users_df = column_renamer(mapped_users_df)
         mapped_users_df = column_generate(mapped_users_df)
-        mapped_users_df.to_csv("study_person_list.csv", index=False)
-        update_last_modified_date(mapped_users_df)
-        print("✅ Exported study_person_list.csv")
+        ExtractIO.write_extract([mapped_users_df], "study_person_list.csv")
+        update_last_modified_date(latest_dates)
+        print(f"✅ Exported {ExtractIO.extract_path('study_person_list.csv')}")
+    checkpoint.clear()
+    return None if users_df.empty else mapped_users_df
+
+
+if __name__ == "__main__":
+    if "--profile" in sys.argv:
+        Profiling.enable()
+    if main() is False:
+        exit(1)
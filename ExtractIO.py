@@ -0,0 +1,217 @@
+import os
+import ast
+import json
+import pandas as pd
+from dotenv import load_dotenv
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+CHUNK_SIZE = int(os.getenv("EXTRACT_CHUNK_SIZE", 5000))
+EXTRACT_FORMAT = os.getenv("EXTRACT_FORMAT", "csv").lower()
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# Column types per dataset (file name without extension) for Parquet/Feather
+# output; columns not listed here, and other datasets, are typed from the
+# first chunk. Subquery columns keep their nested structure.
+SCHEMAS = {
+    "cdms_user_list": {"id": "string", "user_name__v": "string", "user_email__v": "string", "modified_date__v": "string"},
+    "ctms_user_list": {"id": "string", "user_name__v": "string", "user_email__v": "string", "modified_date__v": "string"},
+    "cdms_site_list": {"id": "string", "name__v": "string", "status__v": "string", "modified_date__v": "string"},
+    "ctms_site_list": {"id": "string", "name__v": "string", "status__v": "string", "modified_date__v": "string"},
+    "cdms_study_list": {"id": "string", "name__v": "string", "status__v": "string", "modified_date__v": "string"},
+    "cdms_study_site_pairs": {"study_id": "string", "study_name": "string", "site_name": "string"},
+}
+
+
+# ─── Chunked Record Streams ────────────────────────────────
+def iter_record_chunks(records, chunk_size=CHUNK_SIZE):
+    """Group an iterable of records into DataFrames of at most chunk_size rows."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk)
+
+
+# ─── Subquery Columns ──────────────────────────────────────
+def parse_subquery(value):
+    """Records of one subquery cell, given the API's dict or its JSON text.
+
+    Extracts written before subquery columns were stored as JSON hold a
+    Python repr instead; those are still read, with literal_eval, until the
+    extract is pulled again.
+    """
+    if isinstance(value, str):
+        if not value.strip():
+            return []
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = ast.literal_eval(value)
+    if isinstance(value, dict):
+        records = value.get("data")
+        return list(records) if records is not None else []
+    return []
+
+
+def subquery_to_json(df):
+    """Serialize dict/list cells (subquery results) as JSON text."""
+    for column in df.columns[df.dtypes == object]:
+        values = df[column].dropna()
+        if not values.empty and isinstance(values.iloc[0], (dict, list)):
+            df = df.assign(**{column: df[column].map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v)})
+    return df
+
+
+def flatten_subquery(df, column, child_field, parent_columns, child_column):
+    """One row per (parent, subquery record) pair.
+
+    parent_columns maps parent field names to output column names; the
+    subquery's child_field becomes child_column. A parent without subquery
+    records keeps one row with an empty child_column, so it is still listed.
+    """
+    children = df[column].map(lambda v: [record.get(child_field, "") for record in parse_subquery(v)] or [""])
+    flat = df[list(parent_columns)].rename(columns=parent_columns).assign(**{child_column: children})
+    return flat.explode(child_column).reset_index(drop=True)
+
+
+# ─── Incremental CSV Writer ────────────────────────────────
+def write_csv_chunks(chunks, output_file):
+    """Write DataFrame chunks to output_file as they arrive and return the row count.
+
+    Rows go to a temporary file that only replaces output_file once every
+    chunk has been written, so a failed or empty pull leaves the previous
+    extract in place. Subquery columns are written as JSON.
+    """
+    tmp_file = f"{output_file}.tmp"
+    rows = 0
+    columns = None
+    try:
+        with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+            for chunk in chunks:
+                chunk = subquery_to_json(chunk)
+                if columns is None:
+                    columns = list(chunk.columns)
+                    chunk.to_csv(f, index=False)
+                else:
+                    chunk.reindex(columns=columns).to_csv(f, index=False, header=False)
+                rows += len(chunk)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    if rows:
+        os.replace(tmp_file, output_file)
+    else:
+        os.remove(tmp_file)
+    return rows
+
+
+# ─── Parquet / Feather ─────────────────────────────────────
+def extract_path(output_file, fmt=None):
+    """output_file with the extension of fmt (default EXTRACT_FORMAT)."""
+    fmt = fmt or EXTRACT_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unsupported extract format '{fmt}' (expected one of {', '.join(EXTENSIONS)}).")
+    return os.path.splitext(output_file)[0] + EXTENSIONS[fmt]
+
+
+def find_extract(output_file):
+    """Path of the existing extract, preferring EXTRACT_FORMAT over the other formats, or None."""
+    formats = [EXTRACT_FORMAT] + [fmt for fmt in EXTENSIONS if fmt != EXTRACT_FORMAT]
+    for fmt in formats:
+        path = extract_path(output_file, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _require_pyarrow(fmt):
+    if pa is None:
+        raise RuntimeError(f"EXTRACT_FORMAT={fmt} requires pyarrow (pip install pyarrow).")
+
+
+def _arrow_schema(chunk, dataset):
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    declared = SCHEMAS.get(dataset, {})
+    fields = []
+    for field in schema:
+        if field.name in declared:
+            field = field.with_type(pa.type_for_alias(declared[field.name]))
+        elif pa.types.is_null(field.type):
+            # All-null in the first chunk; later chunks carry the values as text
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def write_arrow_chunks(chunks, output_file, fmt):
+    """Parquet/Feather counterpart of write_csv_chunks, with the dataset's typed schema."""
+    _require_pyarrow(fmt)
+    dataset = os.path.splitext(os.path.basename(output_file))[0]
+    tmp_file = f"{output_file}.tmp"
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            chunk = subquery_to_json(chunk)
+            if writer is None:
+                schema = _arrow_schema(chunk, dataset)
+                if fmt == "parquet":
+                    writer = pa.parquet.ParquetWriter(tmp_file, schema)
+                else:
+                    writer = pa.ipc.new_file(tmp_file, schema)
+            table = pa.Table.from_pandas(chunk.reindex(columns=schema.names), schema=schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    if writer is not None:
+        writer.close()
+    if rows:
+        os.replace(tmp_file, output_file)
+    elif os.path.exists(tmp_file):
+        os.remove(tmp_file)
+    return rows
+
+
+def write_extract(chunks, output_file, fmt=None):
+    """Write chunks as CSV, Parquet or Feather (EXTRACT_FORMAT by default) and return the row count.
+
+    output_file's extension is replaced to match the format.
+    """
+    fmt = fmt or EXTRACT_FORMAT
+    path = extract_path(output_file, fmt)
+    if fmt == "csv":
+        return write_csv_chunks(chunks, path)
+    return write_arrow_chunks(chunks, path, fmt)
+
+
+def read_extract(output_file, columns=None, **csv_kwargs):
+    """Read an extract written by write_extract in whichever format exists; csv_kwargs apply to CSV only."""
+    path = find_extract(output_file)
+    if path is None:
+        raise FileNotFoundError(f"No extract found for {output_file}")
+    if path.endswith(".csv"):
+        return pd.read_csv(path, usecols=columns, **csv_kwargs)
+    _require_pyarrow(os.path.splitext(path)[1][1:])
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import atexit
+import threading
+import contextlib
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+# Both are opt-in: METRICS_REPORT=true prints the summary at exit and, with
+# METRICS_TEXTFILE=vault_sync.prom (say), also writes the Prometheus textfile
+TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+REPORT_AT_EXIT = os.getenv("METRICS_REPORT", "false").lower() == "true"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HELP = {
+    "vault_request_duration_seconds": ("histogram", "Vault HTTP request latency per attempt."),
+    "vault_response_bytes_total": ("counter", "Bytes of Vault response bodies."),
+    "vault_retries_total": ("counter", "Vault requests retried, by reason."),
+    "vault_reauthentications_total": ("counter", "Requests answered 401 INVALID_SESSION_ID and re-sent with a new session."),
+    "vault_sleep_seconds_total": ("counter", "Seconds spent sleeping for the rate limiter or retry backoff."),
+    "vault_pages_total": ("counter", "VQL result pages, fetched from Vault or restored from a checkpoint."),
+    "sync_stage_duration_seconds": ("gauge", "Wall-clock seconds of the last run of each stage."),
+    "sync_stage_records_total": ("counter", "Records processed by each stage."),
+    "sync_last_run_timestamp_seconds": ("gauge", "Unix time the metrics were last written."),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_report_registered = False
+
+
+# ─── Recording ─────────────────────────────────────────────
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _touch():
+    """Write the report when the process exits once anything has been recorded (caller holds _lock)."""
+    global _report_registered
+    if REPORT_AT_EXIT and not _report_registered:
+        _report_registered = True
+        atexit.register(report)
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + amount
+        _touch()
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+        _touch()
+
+
+def observe(name, value, **labels):
+    """Add value to a LATENCY_BUCKETS histogram (also tracking count, sum and max)."""
+    with _lock:
+        key = _key(name, labels)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0, "max": 0.0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["count"] += 1
+        histogram["sum"] += value
+        histogram["max"] = max(histogram["max"], value)
+        _touch()
+
+
+def endpoint(url):
+    """The path of a Vault URL without the API version and query ids, for use as a label."""
+    path = re.sub(r"^/api/[^/]+", "", urlsplit(url).path)
+    return re.sub(r"^/query/[^/]+", "/query/{id}", path) or "/"
+
+
+# ─── HTTP Layer Hooks ──────────────────────────────────────
+def record_request(method, url, status, seconds, response_bytes=0):
+    path = endpoint(url)
+    observe("vault_request_duration_seconds", seconds, method=method, endpoint=path, status=str(status))
+    if response_bytes:
+        inc("vault_response_bytes_total", response_bytes, endpoint=path)
+
+
+def record_retry(url, reason):
+    inc("vault_retries_total", endpoint=endpoint(url), reason=reason)
+
+
+def record_reauthentication(url):
+    inc("vault_reauthentications_total", endpoint=endpoint(url))
+
+
+def record_sleep(kind, seconds):
+    if seconds:
+        inc("vault_sleep_seconds_total", seconds, kind=kind)
+
+
+def record_page(source="vault"):
+    inc("vault_pages_total", source=source)
+
+
+# ─── Stages ────────────────────────────────────────────────
+def records(stage_name, count):
+    """Count records processed by a stage; with its duration this gives records/sec in the summary."""
+    inc("sync_stage_records_total", count, stage=stage_name)
+
+
+@contextlib.contextmanager
+def stage(stage_name):
+    """Time a block (also around awaits) as the duration of stage_name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        set_gauge("sync_stage_duration_seconds", time.perf_counter() - start, stage=stage_name)
+
+
+# ─── Export ────────────────────────────────────────────────
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {key: dict(value, buckets=list(value["buckets"])) for key, value in _histograms.items()}
+
+    lines = []
+    for name, (metric_type, help_text) in HELP.items():
+        if metric_type == "histogram":
+            series = {key: value for key, value in histograms.items() if key[0] == name}
+        else:
+            series = {key: value for key, value in (counters if metric_type == "counter" else gauges).items() if key[0] == name}
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for (_, labels), value in sorted(series.items()):
+            if metric_type != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, value["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path=TEXTFILE):
+    """Atomically replace path with the current metrics (for the node_exporter textfile collector)."""
+    set_gauge("sync_last_run_timestamp_seconds", time.time())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+    return path
+
+
+def _total(name, **match):
+    with _lock:
+        return sum(value for (metric, labels), value in _counters.items()
+                   if metric == name and all(dict(labels).get(k) == v for k, v in match.items()))
+
+
+def summary():
+    """Human-readable end-of-run summary: Vault time per endpoint, retries, sleeps and stage throughput."""
+    with _lock:
+        requests_by_endpoint = {}
+        for (name, labels), histogram in _histograms.items():
+            if name != "vault_request_duration_seconds":
+                continue
+            path = dict(labels)["endpoint"]
+            total = requests_by_endpoint.setdefault(path, {"count": 0, "sum": 0.0, "max": 0.0})
+            total["count"] += histogram["count"]
+            total["sum"] += histogram["sum"]
+            total["max"] = max(total["max"], histogram["max"])
+        durations = {dict(labels)["stage"]: value for (name, labels), value in _gauges.items() if name == "sync_stage_duration_seconds"}
+
+    lines = ["📊 Run metrics"]
+    for path, total in sorted(requests_by_endpoint.items()):
+        response_bytes = _total("vault_response_bytes_total", endpoint=path)
+        lines.append(f"  {path}: {total['count']} request(s), {total['sum']:.2f}s total, "
+                     f"{total['sum'] / total['count']:.3f}s avg, {total['max']:.3f}s max, {response_bytes / 2 ** 20:.2f} MiB")
+    lines.append(f"  Pages: {_total('vault_pages_total', source='vault')} fetched, "
+                 f"{_total('vault_pages_total', source='checkpoint')} from checkpoints")
+    lines.append(f"  Retries: {_total('vault_retries_total')}, re-authentications: {_total('vault_reauthentications_total')}")
+    lines.append(f"  Sleeping: {_total('vault_sleep_seconds_total', kind='rate_limit'):.2f}s rate limit, "
+                 f"{_total('vault_sleep_seconds_total', kind='backoff'):.2f}s backoff")
+    for stage_name, seconds in durations.items():
+        count = _total("sync_stage_records_total", stage=stage_name)
+        rate = f", {count / seconds:,.0f} records/s" if count and seconds else ""
+        lines.append(f"  Stage {stage_name}: {seconds:.2f}s, {count} record(s){rate}")
+    return "\n".join(lines)
+
+
+def report():
+    """Print the summary and write the textfile (when METRICS_TEXTFILE is set)."""
+    print(summary())
+    if TEXTFILE:
+        try:
+            print(f"📈 Metrics written to {write_textfile()}")
+        except OSError as e:
+            print(f"⚠️ Failed to write metrics to {TEXTFILE}: {e}")
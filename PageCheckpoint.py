@@ -0,0 +1,64 @@
+import os
+import json
+import shutil
+import hashlib
+from dotenv import load_dotenv
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+CHECKPOINT_DIR = os.getenv("VAULT_CHECKPOINT_DIR", ".checkpoints")
+
+
+# ─── Page Checkpoint ───────────────────────────────────────
+class PageCheckpoint:
+    """Fetched pages of one VQL query, persisted on disk by page offset.
+
+    The directory name combines the dataset name with a hash of the query
+    text, so a rerun of the same query (same watermark) finds the pages of
+    the interrupted run while a different query starts fresh. The manifest
+    records total and pagesize; if the rerun's first page reports different
+    values the result set has shifted and the saved pages are discarded.
+    Checkpointed queries need a deterministic ORDER BY, or an offset would
+    not name the same rows in the rerun.
+    """
+
+    def __init__(self, name, query, directory=CHECKPOINT_DIR):
+        key = hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(directory, f"{name}-{key}")
+
+    def _page_file(self, offset):
+        return os.path.join(self.path, f"page_{offset}.json")
+
+    def _write_json(self, file_path, data):
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, file_path)
+
+    def start(self, total, pagesize):
+        """Validate saved pages against the new result set and return how many can be reused."""
+        manifest_file = os.path.join(self.path, "manifest.json")
+        manifest = {"total": total, "pagesize": pagesize}
+        try:
+            with open(manifest_file, encoding="utf-8") as f:
+                if json.load(f) != manifest:
+                    self.clear()
+        except (OSError, ValueError):
+            self.clear()
+
+        os.makedirs(self.path, exist_ok=True)
+        self._write_json(manifest_file, manifest)
+        return sum(1 for file_name in os.listdir(self.path) if file_name.startswith("page_") and file_name.endswith(".json"))
+
+    def load(self, offset):
+        try:
+            with open(self._page_file(offset), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, offset, page):
+        self._write_json(self._page_file(offset), page)
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
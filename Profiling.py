@@ -0,0 +1,101 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import contextlib
+import tracemalloc
+from datetime import datetime
+from dotenv import load_dotenv
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+# Relative to the working directory, i.e. next to ctms_sync.log
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", 30))
+TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", 20))
+RUN_ID = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+_enabled = os.getenv("PROFILE", "false").lower() == "true"
+_active = threading.local()
+
+
+def enable(on=True):
+    """Switch profiling on for every stage run afterwards (entry points call this for --profile)."""
+    global _enabled
+    _enabled = on
+
+
+# ─── Stage Profiles ────────────────────────────────────────
+@contextlib.contextmanager
+def profile(stage_name):
+    """Profile a block with cProfile and tracemalloc when profiling is enabled.
+
+    Writes <run>-<stage>.prof (for pstats/snakeviz) and a <run>-<stage>.txt
+    report with wall time, peak traced memory, the top functions by
+    cumulative and own time and the top allocation sites. A stage nested in
+    a profiled one is part of the outer profile. cProfile only sees the
+    calling thread, so work on pool threads shows up as time waiting on
+    their futures; tracemalloc covers every thread.
+    """
+    if not _enabled or getattr(_active, "stage", None):
+        yield
+        return
+
+    _active.stage = stage_name
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        _active.stage = None
+        try:
+            write_report(stage_name, profiler, elapsed, peak, snapshot)
+        except OSError as e:
+            print(f"⚠️ Failed to write the {stage_name} profile: {e}")
+
+
+def profiled(stage_name):
+    """Decorator form of profile()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_report(stage_name, profiler, elapsed, peak, snapshot):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{RUN_ID}-{stage_name}")
+    profiler.dump_stats(f"{base}.prof")
+
+    report = io.StringIO()
+    report.write(f"Stage: {stage_name}\nWall time: {elapsed:.3f}s\nPeak traced memory: {peak / 2 ** 20:.1f} MiB\n\n")
+    stats = pstats.Stats(profiler, stream=report).strip_dirs()
+    report.write("── By cumulative time ──\n")
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    report.write("── By own time ──\n")
+    stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+    report.write("── Top allocation sites (still allocated at stage end) ──\n")
+    for stat in snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics("lineno")[:TOP_ALLOCATIONS]:
+        report.write(f"{stat}\n")
+
+    with open(f"{base}.txt", "w", encoding="utf-8") as f:
+        f.write(report.getvalue())
+    print(f"🔬 {stage_name}: {elapsed:.2f}s, peak {peak / 2 ** 20:.1f} MiB. Profile written to {base}.txt")
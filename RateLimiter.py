@@ -0,0 +1,85 @@
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+MAX_RATE = float(os.getenv("VAULT_MAX_RATE", 10))
+MIN_RATE = float(os.getenv("VAULT_MIN_RATE", 0.2))
+BURST_SIZE = float(os.getenv("VAULT_RATE_BURST", 5))
+BURST_WINDOW = float(os.getenv("VAULT_BURST_WINDOW", 300))
+BURST_RESERVE = int(os.getenv("VAULT_BURST_RESERVE", 200))
+DAILY_RESERVE = int(os.getenv("VAULT_DAILY_RESERVE", 500))
+
+BURST_REMAINING_HEADER = "X-VaultAPI-BurstLimitRemaining"
+DAILY_REMAINING_HEADER = "X-VaultAPI-DailyLimitRemaining"
+
+
+# ─── Adaptive Token Bucket ─────────────────────────────────
+class RateLimiter:
+    """Token bucket shared by every thread calling one Vault.
+
+    The refill rate starts at MAX_RATE and is retuned from each response's
+    burst/daily limit headers. While more than BURST_RESERVE calls of the
+    burst allowance remain, requests run at MAX_RATE. Below that low-water
+    mark the rest is spread evenly over a full burst window, which can never
+    exhaust it: the rate follows remaining / BURST_WINDOW (at least MIN_RATE).
+    The rate drops to MIN_RATE once the daily allowance is down to
+    DAILY_RESERVE calls.
+    """
+
+    def __init__(self, rate=MAX_RATE, capacity=BURST_SIZE):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent and return the seconds spent waiting."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def update(self, headers):
+        burst_remaining = _int_header(headers, BURST_REMAINING_HEADER)
+        daily_remaining = _int_header(headers, DAILY_REMAINING_HEADER)
+        if burst_remaining is None and daily_remaining is None:
+            return
+
+        rate = MAX_RATE
+        if burst_remaining is not None and burst_remaining <= BURST_RESERVE:
+            rate = min(rate, max(MIN_RATE, burst_remaining / BURST_WINDOW))
+        if daily_remaining is not None and daily_remaining <= DAILY_RESERVE:
+            rate = MIN_RATE
+
+        with self._lock:
+            self.rate = rate
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+# ─── Shared Limiters (one per Vault host) ──────────────────
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def for_url(url):
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter()
+        return _limiters[host]
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+import redis
+from dotenv import load_dotenv
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", 3))
+REDIS_RETRY_AFTER = float(os.getenv("REDIS_RETRY_AFTER", 60))
+
+# ─── Shared Pool + Circuit Breaker ─────────────────────────
+_pool = None
+_lock = threading.Lock()
+_down_until = 0.0
+_cache = {}
+
+
+class RedisUnavailable(redis.exceptions.ConnectionError):
+    pass
+
+
+def get_client():
+    """Return a client on the process-wide connection pool.
+
+    After a connection failure Redis is considered down for REDIS_RETRY_AFTER
+    seconds and every call fails immediately instead of waiting for another
+    connect timeout.
+    """
+    global _pool
+    with _lock:
+        if time.monotonic() < _down_until:
+            raise RedisUnavailable(f"Redis at {REDIS_HOST}:{REDIS_PORT} is unavailable (circuit open).")
+        if _pool is None:
+            _pool = redis.ConnectionPool(
+                host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB,
+                socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT,
+            )
+        return redis.Redis(connection_pool=_pool)
+
+
+def _call(operation):
+    global _down_until
+    client = get_client()
+    try:
+        return operation(client)
+    except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError):
+        with _lock:
+            _down_until = time.monotonic() + REDIS_RETRY_AFTER
+        raise
+
+
+# ─── Pipelined Reads / Writes ──────────────────────────────
+def prefetch(*keys):
+    """Read every key in one MGET round-trip and keep the values for later get() calls."""
+    values = _call(lambda client: client.mget(keys))
+    decoded = {key: value.decode() if value is not None else None for key, value in zip(keys, values)}
+    with _lock:
+        _cache.update(decoded)
+    return decoded
+
+
+def get_many(*keys):
+    with _lock:
+        missing = [key for key in keys if key not in _cache]
+    if missing:
+        prefetch(*missing)
+    with _lock:
+        return {key: _cache[key] for key in keys}
+
+
+def get(key):
+    return get_many(key)[key]
+
+
+def set_many(mapping):
+    """Write every key in one pipelined round-trip."""
+    def write(client):
+        pipe = client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, value)
+        return pipe.execute()
+
+    _call(write)
+    with _lock:
+        _cache.update({key: str(value) for key, value in mapping.items()})
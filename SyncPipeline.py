@@ -0,0 +1,259 @@
+import os
+import sys
+import queue
+import asyncio
+import threading
+import contextlib
+import pandas as pd
+from dotenv import load_dotenv
+
+import ExtractIO
+import Metrics
+import Profiling
+import PageCheckpoint
+import RedisStore
+import VaultSession
+import ClinicalStudyList
+import CDMSstudyCreate
+import ClinicalStudyPerson
+import ClindDataUserImport
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 20))
+CHUNK_SIZE = int(os.getenv("PIPELINE_CHUNK_SIZE", 100))
+CREATE_WORKERS = int(os.getenv("PIPELINE_CREATE_WORKERS", 4))
+PERSON_CSV = "study_person_list.csv"
+STUDY_FIELDS = ["name__v", "external_id__v", "global_id__sys"]
+
+_DONE = object()
+
+
+# ─── Queue Plumbing ────────────────────────────────────────
+async def _produce(iterable, out_queue):
+    """Drain a blocking iterable on a worker thread into out_queue.
+
+    The bounded queue applies backpressure to the thread. A failure is
+    passed downstream as the exception itself, and _DONE always follows.
+    """
+    loop = asyncio.get_running_loop()
+
+    def drain():
+        for item in iterable:
+            asyncio.run_coroutine_threadsafe(out_queue.put(item), loop).result()
+
+    try:
+        await asyncio.to_thread(drain)
+    except Exception as e:
+        await out_queue.put(e)
+        raise
+    finally:
+        await out_queue.put(_DONE)
+
+
+async def _drain(in_queue, item):
+    """Discard items up to _DONE so an upstream producer never blocks on a stage that failed."""
+    while item is not _DONE:
+        item = await in_queue.get()
+
+
+async def _timed(stage_name, coroutine):
+    with Metrics.stage(stage_name):
+        return await coroutine
+
+
+def _iter_sync_queue(sync_queue):
+    """Yield chunks handed to a writer thread until None; an exception aborts the write."""
+    while (item := sync_queue.get()) is not None:
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+# ─── Stages ────────────────────────────────────────────────
+async def route_studies(study_chunks, create_queue, index, output_file):
+    """Classify and save fetched study chunks and queue studies missing from CDMS for creation."""
+    writer_queue = queue.Queue()
+    writer = asyncio.create_task(asyncio.to_thread(ExtractIO.write_extract, _iter_sync_queue(writer_queue), output_file))
+    latest_dates = []
+    chunk = None
+    try:
+        while (chunk := await study_chunks.get()) is not _DONE:
+            if isinstance(chunk, BaseException):
+                raise chunk
+            Metrics.records("route_studies", len(chunk))
+            chunk = ClinicalStudyList.classify_organizations(chunk)
+            writer_queue.put(chunk)
+            if "modified_date__v" in chunk.columns:
+                latest_dates.append(chunk["modified_date__v"].dropna().max())
+            for study in CDMSstudyCreate.skip_existing(CDMSstudyCreate.iter_study_rows(chunk.reindex(columns=STUDY_FIELDS)), index):
+                await create_queue.put(study)
+    except BaseException as e:
+        writer_queue.put(e)
+        with contextlib.suppress(BaseException):
+            await writer
+        await _drain(study_chunks, chunk)
+        raise
+    finally:
+        await create_queue.put(_DONE)
+
+    writer_queue.put(None)
+    total = await writer
+    print(f"✅ Saved {total} studies to {ExtractIO.extract_path(output_file)}")
+    return latest_dates
+
+
+async def create_studies(session, create_queue, pending, stop_event):
+    """Submit study creations from create_queue and hand them to the verifier thread."""
+    while (study := await create_queue.get()) is not _DONE:
+        name, external_id, payload = study
+        if stop_event.is_set():
+            continue
+        try:
+            submitted, error = await asyncio.to_thread(CDMSstudyCreate.create_study, session, payload)
+        except Exception as e:
+            CDMSstudyCreate.log_failure(name, external_id, str(e))
+            continue
+        if error == "SESSION_EXPIRED":
+            print(" Processing stopped: Session expired. Please refresh your session.")
+            stop_event.set()
+            continue
+        Metrics.records("create_studies", 1)
+        pending.put((name, external_id, submitted))
+    # Let the sibling workers see the end of the queue too
+    await create_queue.put(_DONE)
+
+
+async def import_persons(person_chunks, creation, stop_event, session, output_file, import_users=True):
+    """Map fetched study persons to import rows, save them and import them once the creation task is done.
+
+    The import fails without sending anything when study creation raised or
+    was stopped (stop_event set), since the users' studies may not exist.
+    """
+    mapped = []
+    latest_dates = []
+    chunk = None
+    try:
+        while (chunk := await person_chunks.get()) is not _DONE:
+            if isinstance(chunk, BaseException):
+                raise chunk
+            Metrics.records("import_persons", len(chunk))
+            if "modified_date__v" in chunk.columns:
+                latest_dates.append(chunk["modified_date__v"].dropna().max())
+            chunk = ClinicalStudyPerson.mapper(chunk)
+            chunk = ClinicalStudyPerson.column_renamer(chunk)
+            mapped.append(ClinicalStudyPerson.column_generate(chunk))
+    except BaseException:
+        await _drain(person_chunks, chunk)
+        raise
+
+    if not mapped:
+        print("✅ No new study person records to process.")
+        return latest_dates
+
+    total = await asyncio.to_thread(ExtractIO.write_extract, mapped, output_file)
+    print(f"✅ Exported {total} study persons to {ExtractIO.extract_path(output_file)}")
+    if import_users:
+        # Users are granted access to studies, so those must exist first
+        await asyncio.wait({creation})
+        if creation.cancelled() or creation.exception() is not None or stop_event.is_set():
+            raise RuntimeError("study creation did not finish cleanly; users were not imported")
+        users = pd.concat(mapped, ignore_index=True).fillna("").to_dict("records")
+        results = await asyncio.to_thread(ClindDataUserImport.import_users, users, session)
+        failed = sum(result["users"] for result in results if result["status"] != "SUCCESS")
+        if failed:
+            raise RuntimeError(f"{failed} user(s) failed to import (see {ClindDataUserImport.RESULTS_CSV})")
+    return latest_dates
+
+
+# ─── Pipeline ──────────────────────────────────────────────
+async def run_pipeline(ctms, cdms, import_users=True):
+    """Run study extraction, creation, person extraction and user import as overlapping stages.
+
+    Stages are connected by bounded queues: studies are created while later
+    pages are still being fetched, and study persons are extracted while
+    creation runs. Blocking Vault calls run on worker threads over the
+    shared pooled VaultClient session.
+    """
+    study_query = ClinicalStudyList.build_query(ClinicalStudyList.get_last_modified_date())
+    person_date = ClinicalStudyPerson.get_last_modified_date()
+    study_checkpoint = PageCheckpoint.PageCheckpoint("ctms_study_list", study_query)
+    person_checkpoint = PageCheckpoint.PageCheckpoint("study_person_list", ClinicalStudyPerson.build_query(person_date))
+
+    index = CDMSstudyCreate.StudyMasterIndex(cdms)
+    error = await asyncio.to_thread(index.refresh, True)
+    if error == "SESSION_EXPIRED":
+        print(" Processing stopped: Session expired. Please refresh your session.")
+        return False
+    if error:
+        print(f" Could not list existing studies ({error}); no studies will be skipped.")
+
+    study_chunks = asyncio.Queue(QUEUE_SIZE)
+    create_queue = asyncio.Queue(QUEUE_SIZE)
+    person_chunks = asyncio.Queue(QUEUE_SIZE)
+    pending = queue.Queue()
+    stop_event = threading.Event()
+
+    studies = ExtractIO.iter_record_chunks(ClinicalStudyList.iter_CTMSStudyList(ctms, study_query, study_checkpoint), CHUNK_SIZE)
+    persons = ExtractIO.iter_record_chunks(ClinicalStudyPerson.iter_Study_Person_records(ctms, person_date, person_checkpoint), CHUNK_SIZE)
+
+    async def creation():
+        verifier = asyncio.create_task(asyncio.to_thread(CDMSstudyCreate.verify_studies, cdms, index, pending, stop_event))
+        try:
+            await asyncio.gather(*(create_studies(cdms, create_queue, pending, stop_event) for _ in range(CREATE_WORKERS)))
+        finally:
+            pending.put(None)
+            await verifier
+
+    creation_task = asyncio.create_task(_timed("create_studies", creation()))
+    study_fetch, study_dates, created, person_fetch, person_dates = await asyncio.gather(
+        _timed("fetch_studies", _produce(studies, study_chunks)),
+        _timed("route_studies", route_studies(study_chunks, create_queue, index, ClinicalStudyList.OUTPUT_CSV)),
+        creation_task,
+        _timed("fetch_persons", _produce(persons, person_chunks)),
+        _timed("import_persons", import_persons(person_chunks, creation_task, stop_event, cdms, PERSON_CSV, import_users)),
+        return_exceptions=True,
+    )
+
+    # Watermarks only move forward for stages that completed
+    ok = True
+    for stage, result in (("Study extraction", study_dates), ("Study creation", created), ("Person import", person_dates)):
+        if isinstance(result, BaseException):
+            print(f"❌ {stage} failed: {result}")
+            ok = False
+    if not isinstance(study_dates, BaseException):
+        ClinicalStudyList.update_last_modified_date(pd.DataFrame({"modified_date__v": study_dates}))
+        study_checkpoint.clear()
+    if not isinstance(person_dates, BaseException):
+        ClinicalStudyPerson.update_last_modified_date(pd.DataFrame({"modified_date__v": person_dates}))
+        person_checkpoint.clear()
+    return ok and not stop_event.is_set()
+
+
+# ─── Main Execution ─────────────────────────────────────────
+@Profiling.profiled("pipeline")
+def main(import_users=True):
+    ctms = VaultSession.ctms()
+    cdms = VaultSession.cdms()
+    try:
+        RedisStore.prefetch(*ctms.redis_keys(), *cdms.redis_keys(), ClinicalStudyList.REDIS_KEY, ClinicalStudyPerson.REDIS_MODIFIED_KEY)
+    except Exception as e:
+        print(f"⚠️ Redis unavailable: {e}")
+
+    try:
+        ctms.get_session_id()
+        cdms.get_session_id()
+    except Exception as e:
+        print(f"❌ No valid session ID: {e}. Aborting.")
+        return False
+
+    print("🔄 CTMS → CDMS pipeline started.")
+    ok = asyncio.run(run_pipeline(ctms, cdms, import_users))
+    print("✅ Pipeline completed." if ok else "⚠️ Pipeline finished with errors.")
+    return ok
+
+
+if __name__ == "__main__":
+    if "--profile" in sys.argv:
+        Profiling.enable()
+    sys.exit(0 if main(import_users="--no-import" not in sys.argv) else 1)
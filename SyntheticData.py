@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import random
+import argparse
+
+import pandas as pd
+
+import ExtractIO
+
+TEAM_ROLES = [
+    "Deputy Investigator", "Laboratory Staff", "Principal Investigator", "Regulatory Document Co-ordinator",
+    "Study Co-ordinator", "Study Nurse", "Subinvestigator",
+]
+ORGANIZATIONS = [
+    "Almac Clinical Technologies LLC", "Nanavati Hospital", "Charité Berlin", "IQVIA", "Parexel", "ICON plc",
+]
+COUNTRIES = ["Germany", "France", "Spain", "Italy", "Poland", "United States", "Japan", "Brazil"]
+MILESTONE_MASTER_SETS = ["OOW000000004010", "OOW000000000201", "OOW000000004001"]
+MODIFIED_DATE = "2024-06-01T00:00:00.000Z"
+API_VERSION = "v24.1"
+
+
+# ─── Records ───────────────────────────────────────────────
+def study_records(studies, sites_per_study, rng):
+    """study__v records with their study_organizations__vr and sites__vr subqueries."""
+    records = []
+    for number in range(1, studies + 1):
+        name = f"BI-{number:05d}"
+        organizations = rng.sample(ORGANIZATIONS, rng.randint(0, 2))
+        records.append({
+            "id": f"V{number:07d}",
+            "name__v": name,
+            "protocol_title__clin": f"Protocol {name}",
+            "global_id__sys": f"G{number:07d}",
+            "external_id__v": None,
+            "state__v": "active_state__v",
+            "status__v": "active__v",
+            "connect_to_vault_cdms__v": False,
+            "study_type__v": "interventional__v",
+            "milestone_master_set__v": rng.choice(MILESTONE_MASTER_SETS),
+            "modified_date__v": MODIFIED_DATE,
+            "study_organizations__vr": _subquery({"organization__vr.name__v": org} for org in organizations),
+            "sites__vr": _subquery({"name__v": f"{name}-SITE-{site:03d}"} for site in range(1, sites_per_study + 1)),
+        })
+    return records
+
+
+def person_records(persons, studies, rng, existing_users=0):
+    """study_person__clin records spread over studies, one team role each.
+
+    The first existing_users persons get the user names of tenant users
+    (see user_records), so validation reports them as existing.
+    """
+    records = []
+    for number in range(persons):
+        study = rng.choice(studies)
+        sites = study["sites__vr"]["data"]
+        email = _user_name(number) if number < existing_users else f"person{number:07d}@site.example.com"
+        records.append({
+            "email__clin": email,
+            "name__v": f"First{number} Last{number}",
+            "last_name__v": f"Last{number}",
+            "first_name__v": f"First{number}",
+            "person_type__cr.name__v": "External",
+            "team_role__vr.name__v": rng.choice(TEAM_ROLES),
+            "site_connect_user__v": "false",
+            "study__clinr.name__v": study["name__v"],
+            "study__clinr.status__v": "active__v",
+            "study_country__clinr.name__v": rng.choice(COUNTRIES),
+            "site__clinr.name__v": rng.choice(sites)["name__v"] if sites else None,
+            "start_date__clin": "2024-01-01",
+            "end_date__clin": None,
+            "state__v": "active_state__v",
+            "previous_study_state__c": "active__c",
+            "modified_date__v": MODIFIED_DATE,
+        })
+    return records
+
+
+def user_records(users):
+    """Tenant users records (user_name__v is the e-mail address, as in the user-list extracts)."""
+    return [{
+        "id": str(number + 1),
+        "user_name__v": _user_name(number),
+        "user_email__v": _user_name(number),
+        "status__v": "active__v",
+        "modified_date__v": MODIFIED_DATE,
+    } for number in range(users)]
+
+
+def generate(users=10_000, studies=200, sites_per_study=10, persons=None, existing_users=0, seed=42):
+    """A seeded tenant: Vault object name → records, as served by VaultSimulator.
+
+    persons defaults to users; the same seed always yields the same data.
+    """
+    rng = random.Random(seed)
+    study_list = study_records(studies, sites_per_study, rng)
+    return {
+        "study__v": study_list,
+        "study_person__clin": person_records(users if persons is None else persons, study_list, rng, existing_users),
+        "users": user_records(users),
+    }
+
+
+def _subquery(rows):
+    rows = list(rows)
+    return {"responseDetails": {"size": len(rows), "total": len(rows)}, "data": rows}
+
+
+def _user_name(number):
+    return f"user{number:07d}@tenant.example.com"
+
+
+# ─── Vault-Style Responses ─────────────────────────────────
+def query_page(rows, offset, page_size, page_path):
+    """One VQL response page of rows; page_path is the URL path the next/previous_page links point to."""
+    page = rows[offset:offset + page_size]
+    details = {"pagesize": page_size, "pageoffset": offset, "size": len(page), "total": len(rows)}
+    if offset + page_size < len(rows):
+        details["next_page"] = f"{page_path}?pagesize={page_size}&pageoffset={offset + page_size}"
+    if offset > 0:
+        details["previous_page"] = f"{page_path}?pagesize={page_size}&pageoffset={max(0, offset - page_size)}"
+    return {"responseStatus": "SUCCESS", "responseDetails": details, "data": page}
+
+
+def iter_query_pages(rows, page_size=1000, query_id="synthetic", version=API_VERSION):
+    for offset in range(0, max(len(rows), 1), page_size):
+        yield query_page(rows, offset, page_size, f"/api/{version}/query/{query_id}")
+
+
+# ─── Extract Files ─────────────────────────────────────────
+def import_template(data):
+    """The user import template rows for the study persons, built by the ClinicalStudyPerson transforms."""
+    import ClinicalStudyPerson
+    df = pd.DataFrame(data["study_person__clin"]).drop(columns=["previous_study_state__c"])
+    df = ClinicalStudyPerson.mapper(df)
+    df = ClinicalStudyPerson.column_renamer(df)
+    return ClinicalStudyPerson.column_generate(df)
+
+
+def write_files(data, output_dir):
+    """Write the files the scripts exchange into output_dir and return their paths.
+
+    study_output.csv (studies awaiting creation), cdms_study_site_list.csv,
+    cdms_user_list.csv and ctms_user_list.csv go through ExtractIO, so they
+    follow EXTRACT_FORMAT; the import template is always CSV.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    studies = pd.DataFrame(data["study__v"])
+    users = pd.DataFrame(data["users"])[["id", "user_name__v", "user_email__v", "modified_date__v"]]
+    extracts = {
+        "study_output.csv": studies.drop(columns=["sites__vr"]).rename(columns={"study_organizations__vr": "organization_names"}),
+        "cdms_study_site_list.csv": studies[["id", "name__v", "sites__vr"]],
+        "cdms_user_list.csv": users,
+        "ctms_user_list.csv": users,
+    }
+    paths = []
+    for file_name, df in extracts.items():
+        output_file = os.path.join(output_dir, file_name)
+        ExtractIO.write_extract([df], output_file)
+        paths.append(ExtractIO.extract_path(output_file))
+
+    template_file = os.path.join(output_dir, "user-import-template-24r2.csv")
+    import_template(data).to_csv(template_file, index=False)
+    paths.append(template_file)
+    return paths
+
+
+def write_pages(data, output_dir, page_size=1000):
+    """Write every object as Vault query response pages (<object>_page_<n>.json) and return their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for object_name, rows in data.items():
+        for number, page in enumerate(iter_query_pages(rows, page_size, query_id=object_name)):
+            path = os.path.join(output_dir, f"{object_name}_page_{number:05d}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(page, f)
+            paths.append(path)
+    return paths
+
+
+# ─── Entry Point ───────────────────────────────────────────
+def add_arguments(parser):
+    """Dataset-size options shared by the generator, VaultSimulator and Benchmark command lines."""
+    parser.add_argument("--users", type=int, default=10_000, help="tenant users (and study persons, unless --persons)")
+    parser.add_argument("--persons", type=int, default=None, help="study person records")
+    parser.add_argument("--studies", type=int, default=200)
+    parser.add_argument("--sites-per-study", type=int, default=10)
+    parser.add_argument("--existing-users", type=int, default=0, help="study persons that already exist as tenant users")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def from_arguments(args):
+    return generate(args.users, args.studies, args.sites_per_study, args.persons, args.existing_users, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic Vault tenant as extract files and/or query pages.")
+    add_arguments(parser)
+    parser.add_argument("--output-dir", default="synthetic", help="where to write the extract files")
+    parser.add_argument("--pages", default=None, help="also write Vault query response pages to this directory")
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    data = from_arguments(args)
+    for path in write_files(data, args.output_dir):
+        print(f"✅ Wrote {path}")
+    if args.pages:
+        pages = write_pages(data, args.pages, args.page_size)
+        print(f"✅ Wrote {len(pages)} query pages to {args.pages}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+import Metrics
+import RateLimiter
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+POOL_MAXSIZE = int(os.getenv("VAULT_POOL_MAXSIZE", 10))
+PAGE_WORKERS = int(os.getenv("VAULT_PAGE_WORKERS", 4))
+REQUEST_TIMEOUT = float(os.getenv("VAULT_TIMEOUT", 300))
+MAX_RETRIES = int(os.getenv("VAULT_MAX_RETRIES", 5))
+BACKOFF_BASE = float(os.getenv("VAULT_BACKOFF_BASE", 1))
+BACKOFF_MAX = float(os.getenv("VAULT_BACKOFF_MAX", 60))
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# ─── Pooled Sessions (one per Vault host) ──────────────────
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """Return the shared keep-alive session for the Vault host serving url."""
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount(f"{parts.scheme}://", adapter)
+            _sessions[host] = session
+        return session
+
+
+# ─── Request Helpers ───────────────────────────────────────
+def is_invalid_session(response):
+    """Check if the API response indicates an expired session"""
+    if response.status_code != 401:
+        return False
+    try:
+        errors = response.json().get("errors", [])
+    except ValueError:
+        return False
+    return any(err.get("type") == "INVALID_SESSION_ID" for err in errors)
+
+
+# ─── Retry With Backoff ────────────────────────────────────
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def retry_after(response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _send(method, url, idempotent=None, **kwargs):
+    """Send one request on the pooled session, paced by the host's shared rate limiter.
+
+    429 answers are always retried; 502/503/504, timeouts and dropped
+    connections only when the call is idempotent (GET by default, or callers
+    passing idempotent=True such as VQL queries), so a create is never sent
+    twice. Only this request is repeated, never the pages before it.
+    """
+    if idempotent is None:
+        idempotent = method == "GET"
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    limiter = RateLimiter.for_url(url)
+
+    for attempt in range(MAX_RETRIES + 1):
+        Metrics.record_sleep("rate_limit", limiter.acquire())
+        start = time.perf_counter()
+        try:
+            response = get_session(url).request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            Metrics.record_request(method, url, type(e).__name__, time.perf_counter() - start)
+            retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+            if not retryable or attempt == MAX_RETRIES:
+                raise
+            reason = type(e).__name__
+            delay = backoff_delay(attempt)
+        else:
+            Metrics.record_request(method, url, response.status_code, time.perf_counter() - start, len(response.content))
+            limiter.update(response.headers)
+            status = response.status_code
+            if status not in RETRY_STATUSES or attempt == MAX_RETRIES or (status != 429 and not idempotent):
+                return response
+            reason = f"HTTP {status}"
+            delay = retry_after(response)
+            if delay is None:
+                delay = backoff_delay(attempt)
+
+        print(f"⏳ {reason} from {urlsplit(url).path}; retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})")
+        Metrics.record_retry(url, reason)
+        Metrics.record_sleep("backoff", delay)
+        time.sleep(delay)
+
+
+def request(method, url, session_manager=None, **kwargs):
+    """Send a request on the pooled session for url's host.
+
+    With a session_manager the Authorization header is filled in from it, and
+    a 401 INVALID_SESSION_ID answer triggers one re-authentication and retry.
+    """
+    if session_manager is None:
+        return _send(method, url, **kwargs)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    session_id = session_manager.get_session_id()
+    headers["Authorization"] = f"Bearer {session_id}"
+    response = _send(method, url, headers=headers, **kwargs)
+
+    if is_invalid_session(response):
+        Metrics.record_reauthentication(url)
+        session_id = session_manager.refresh(session_id)
+        headers["Authorization"] = f"Bearer {session_id}"
+        response = _send(method, url, headers=headers, **kwargs)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+# ─── Paginated VQL Queries ─────────────────────────────────
+def page_urls(vault_url, response_details):
+    """Build the URL of every page after the first from its responseDetails.
+
+    Returns None when the offsets cannot be derived (no total/pagesize or a
+    next_page link without pageoffset), in which case callers must follow
+    next_page links one at a time.
+    """
+    next_page = response_details.get("next_page")
+    if not next_page:
+        return []
+    total = int(response_details.get("total", 0) or 0)
+    pagesize = int(response_details.get("pagesize", 0) or 0)
+    offset = int(response_details.get("pageoffset", 0) or 0)
+    parts = urlsplit(next_page)
+    params = dict(parse_qsl(parts.query))
+    if total <= 0 or pagesize <= 0 or "pageoffset" not in params:
+        return None
+
+    urls = []
+    for page_offset in range(offset + pagesize, total, pagesize):
+        params["pageoffset"] = str(page_offset)
+        urls.append(vault_url + urlunsplit(("", "", parts.path, urlencode(params), "")))
+    return urls
+
+
+def page_offset(url):
+    return int(dict(parse_qsl(urlsplit(url).query)).get("pageoffset", 0))
+
+
+def fetch_page(url, headers, session_manager=None, checkpoint=None):
+    """Fetch one result page, reusing or saving it through checkpoint when given."""
+    if checkpoint is not None:
+        page = checkpoint.load(page_offset(url))
+        if page is not None:
+            Metrics.record_page("checkpoint")
+            return page
+
+    response = get(url, headers=headers, session_manager=session_manager)
+    response.raise_for_status()
+    page = response.json()
+    Metrics.record_page()
+    if checkpoint is not None and "errors" not in page:
+        checkpoint.save(page_offset(url), page)
+    return page
+
+
+def _iter_concurrently(urls, headers, max_workers, session_manager=None, checkpoint=None):
+    """Fetch urls on a thread pool, yielding pages in order with at most max_workers in flight."""
+    url_iter = iter(urls)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for url in islice(url_iter, max_workers):
+                pending.append(executor.submit(fetch_page, url, headers, session_manager, checkpoint))
+            while pending:
+                page = pending.popleft().result()
+                next_url = next(url_iter, None)
+                if next_url is not None:
+                    pending.append(executor.submit(fetch_page, next_url, headers, session_manager, checkpoint))
+                yield page
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def iter_remaining_pages(vault_url, headers, first_page, max_workers=PAGE_WORKERS, session_manager=None, checkpoint=None):
+    """Yield the JSON of every page after first_page, in page order.
+
+    With a PageCheckpoint, pages saved by an interrupted run of the same query
+    are read back from disk and only the missing offsets are requested. Pages
+    reached by following next_page links one by one cannot be skipped, so they
+    are never checkpointed.
+    """
+    details = first_page.get("responseDetails", {})
+    urls = page_urls(vault_url, details)
+
+    if urls is None:
+        next_page = details.get("next_page")
+        while next_page:
+            page = fetch_page(vault_url + next_page, headers, session_manager)
+            yield page
+            next_page = page.get("responseDetails", {}).get("next_page")
+        return
+
+    if checkpoint is not None and urls:
+        reused = checkpoint.start(int(details["total"]), int(details["pagesize"]))
+        if reused:
+            print(f"♻️ Resuming query: {reused} of {len(urls)} remaining pages restored from checkpoint.")
+
+    yield from _iter_concurrently(urls, headers, max_workers, session_manager, checkpoint)
+
+
+def iter_query_pages(vault_url, query_url, headers, payload, max_workers=PAGE_WORKERS, session_manager=None, checkpoint=None):
+    """Run a VQL query and yield each result page's JSON as it arrives, in page order."""
+    response = post(query_url, data=payload, headers=headers, session_manager=session_manager, idempotent=True)
+    response.raise_for_status()
+    first_page = response.json()
+    Metrics.record_page()
+    yield first_page
+    yield from iter_remaining_pages(vault_url, headers, first_page, max_workers, session_manager, checkpoint)
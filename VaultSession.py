@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+import VaultClient
+import RedisStore
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+CLIENT_ID = os.getenv("CLIENT_ID")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+CTMS_API_VERSION = os.getenv("CTMS_API_VERSION")
+CTMS_URL = os.getenv("CTMS_URL")
+API_VERSION = os.getenv("API_VERSION")
+BASE_URL = os.getenv("BASE_URL")
+SESSION_MAX_AGE = int(os.getenv("VAULT_SESSION_MAX_AGE", 20 * 60))
+
+
+# ─── Session Manager ───────────────────────────────────────
+class SessionManager:
+    """Caches a Vault session in-process and re-authenticates when it expires.
+
+    The session is looked up in Redis, then in the session file, and only then
+    created through the /auth endpoint. A session older than max_age seconds is
+    replaced before use; VaultClient calls refresh() when Vault still answers
+    401 INVALID_SESSION_ID and retries the request with the new session.
+    """
+
+    def __init__(self, name, vault_url, api_version, redis_key, session_file, max_age=SESSION_MAX_AGE):
+        self.name = name
+        self.vault_url = vault_url
+        self.api_version = api_version
+        self.redis_key = redis_key
+        self.session_file = session_file
+        self.max_age = max_age
+        self._session_id = None
+        self._issued_at = 0.0
+        self._lock = threading.Lock()
+
+    def redis_keys(self):
+        return self.redis_key, f"{self.redis_key}:issued_at"
+
+    def get_session_id(self):
+        with self._lock:
+            if self._session_id is None:
+                self._session_id, self._issued_at = self._load()
+            if self._session_id is None or time.time() - self._issued_at > self.max_age:
+                self._authenticate()
+            return self._session_id
+
+    def refresh(self, stale_session_id=None):
+        """Re-authenticate, unless another thread already replaced stale_session_id."""
+        with self._lock:
+            if stale_session_id is None or self._session_id in (None, stale_session_id):
+                self._authenticate()
+            return self._session_id
+
+    # ─── Authentication ────────────────────────────────────
+    def _authenticate(self):
+        url = f"{self.vault_url}/api/{self.api_version}/auth"
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json',
+        }
+        data = {
+            'username': CLIENT_ID,
+            'password': CLIENT_SECRET
+        }
+        response = VaultClient.post(url, headers=headers, data=data, idempotent=True)
+        response.raise_for_status()
+        response_json = response.json()
+        if 'sessionId' not in response_json:
+            raise RuntimeError(f"'sessionId' not found in the {self.name} auth response: {response_json}")
+
+        print(f"🔐 {self.name} session authenticated.")
+        self._session_id = response_json['sessionId']
+        self._issued_at = time.time()
+        self._store()
+
+    # ─── Redis + File Persistence ──────────────────────────
+    def _load(self):
+        try:
+            session_key, issued_key = self.redis_keys()
+            values = RedisStore.get_many(session_key, issued_key)
+            if values[session_key]:
+                print("✅ Session ID loaded from Redis.")
+                issued_at = values[issued_key]
+                return values[session_key], float(issued_at) if issued_at else time.time()
+            print("⚠️ Redis key not found. Falling back to file.")
+        except Exception as e:
+            print(f"⚠️ Redis unavailable: {e}. Falling back to file.")
+
+        try:
+            with open(self.session_file) as f:
+                session_id = f.read().strip()
+            if session_id:
+                print("✅ Session ID loaded from file.")
+                return session_id, os.path.getmtime(self.session_file)
+            print("❌ Session ID file is empty.")
+        except Exception as e:
+            print(f"❌ Failed to load session ID from file: {e}")
+        return None, 0.0
+
+    def _store(self):
+        try:
+            session_key, issued_key = self.redis_keys()
+            RedisStore.set_many({session_key: self._session_id, issued_key: self._issued_at})
+            print(f"✅ Session ID saved to Redis under key '{self.redis_key}'.")
+        except Exception as e:
+            print(f"⚠️ Redis unavailable or failed to save: {e}")
+
+        try:
+            with open(self.session_file, "w") as f:
+                f.write(self._session_id)
+            print(f"✅ Session ID saved to file: {self.session_file}")
+        except Exception as e:
+            print(f"❌ Failed to save session ID to file: {e}")
+
+
+# ─── Shared Managers ───────────────────────────────────────
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def _shared(name, *args):
+    with _managers_lock:
+        if name not in _managers:
+            _managers[name] = SessionManager(name, *args)
+        return _managers[name]
+
+
+def ctms():
+    return _shared("CTMS", CTMS_URL, CTMS_API_VERSION, "CTMS:session_id", "CTMSsession_id.txt")
+
+
+def cdms():
+    return _shared("CDMS", BASE_URL, API_VERSION, "CDMS:session_id", "CDMSsession_id.txt")
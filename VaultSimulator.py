@@ -0,0 +1,475 @@
+import os
+import io
+import re
+import csv
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from dotenv import load_dotenv
+
+import RateLimiter
+import SyntheticData
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+SIM_HOST = os.getenv("VAULT_SIM_HOST", "127.0.0.1")
+SIM_PORT = int(os.getenv("VAULT_SIM_PORT", 8765))
+SIM_PAGE_SIZE = int(os.getenv("VAULT_SIM_PAGE_SIZE", 1000))
+SIM_LATENCY = float(os.getenv("VAULT_SIM_LATENCY", 0.05))
+SIM_JITTER = float(os.getenv("VAULT_SIM_JITTER", 0.02))
+SIM_CREATE_DELAY = float(os.getenv("VAULT_SIM_CREATE_DELAY", 1))
+SIM_BURST_LIMIT = int(os.getenv("VAULT_SIM_BURST_LIMIT", 2000))
+SIM_BURST_WINDOW = float(os.getenv("VAULT_SIM_BURST_WINDOW", 300))
+SIM_DAILY_LIMIT = int(os.getenv("VAULT_SIM_DAILY_LIMIT", 100000))
+SIM_RETRY_AFTER = os.getenv("VAULT_SIM_RETRY_AFTER", "1")
+SESSION_GRACE = 1.0
+
+API_PATH = re.compile(r"^/api/[^/]+(/.*)$")
+SUBQUERY = re.compile(r"\(\s*SELECT\b.*?\bFROM\s+(\w+)[^)]*\)(?:\s+AS\s+(\w+))?", re.IGNORECASE | re.DOTALL)
+FROM_CLAUSE = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+WHERE_TOKEN = re.compile(r"\s*(?:(\()|(\))|\b(AND|OR)\b|([\w.]+)\s*(>=|<=|!=|=|>|<)\s*('[^']*'|[\w.:-]+))", re.IGNORECASE)
+COMPARE = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+# ─── VQL Subset ────────────────────────────────────────────
+def parse_query(vql):
+    """Split the VQL the sync scripts send into (object, select fields, row predicate, order).
+
+    Fields are (record key, response key) pairs: a subquery reads the
+    relationship's records and is returned under its alias, if any. The
+    outer WHERE clause may combine comparisons against quoted strings, null,
+    booleans or numbers with AND, OR and parentheses, which covers every
+    query in the repo. Order is a list of (field, descending) pairs from an
+    ORDER BY clause.
+    """
+    subqueries = []
+
+    def stash(match):
+        subqueries.append((match.group(1), match.group(2) or match.group(1)))
+        return f"__subquery{len(subqueries) - 1}__"
+
+    flat = SUBQUERY.sub(stash, " ".join(vql.split()))
+    match = FROM_CLAUSE.search(flat)
+    if match is None:
+        raise ValueError(f"Unsupported query: {vql}")
+    select = flat[:match.start()].strip()
+    select = re.sub(r"^SELECT\s+", "", select, flags=re.IGNORECASE)
+    fields = []
+    for field in (part.strip() for part in select.split(",")):
+        placeholder = re.fullmatch(r"__subquery(\d+)__", field)
+        fields.append(subqueries[int(placeholder.group(1))] if placeholder else (field, field))
+
+    rest = ORDER_BY.split(flat[match.end():], maxsplit=1)
+    order = [parse_order_term(term) for term in rest[1].split(",")] if len(rest) > 1 else []
+    where = re.split(r"\bWHERE\b", rest[0], maxsplit=1, flags=re.IGNORECASE)
+    predicate = parse_where(where[1]) if len(where) > 1 else (lambda record: True)
+    return match.group(1), fields, predicate, order
+
+
+def parse_order_term(term):
+    parts = term.split()
+    if not 1 <= len(parts) <= 2 or (len(parts) == 2 and parts[1].upper() not in ("ASC", "DESC")):
+        raise ValueError(f"Unsupported ORDER BY term: {term.strip()}")
+    return parts[0], len(parts) == 2 and parts[1].upper() == "DESC"
+
+
+def parse_where(clause):
+    """Compile a WHERE clause into a predicate over record dicts."""
+    tokens, position = [], 0
+    clause = clause.strip()
+    while position < len(clause):
+        match = WHERE_TOKEN.match(clause, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Unsupported WHERE clause near: {clause[position:position + 40]}")
+        tokens.append(match.groups())
+        position = match.end()
+
+    def expression(i):
+        term, i = conjunction(i)
+        terms = [term]
+        while i < len(tokens) and (tokens[i][2] or "").upper() == "OR":
+            term, i = conjunction(i + 1)
+            terms.append(term)
+        return (lambda record: any(term(record) for term in terms)), i
+
+    def conjunction(i):
+        factor, i = primary(i)
+        factors = [factor]
+        while i < len(tokens) and (tokens[i][2] or "").upper() == "AND":
+            factor, i = primary(i + 1)
+            factors.append(factor)
+        return (lambda record: all(factor(record) for factor in factors)), i
+
+    def primary(i):
+        if i >= len(tokens):
+            raise ValueError("Unexpected end of WHERE clause")
+        open_paren, _, _, field, op, literal = tokens[i]
+        if open_paren:
+            inner, i = expression(i + 1)
+            if i >= len(tokens) or not tokens[i][1]:
+                raise ValueError("Unbalanced parentheses in WHERE clause")
+            return inner, i + 1
+        if field is None:
+            raise ValueError(f"Unexpected token in WHERE clause: {tokens[i]}")
+        return comparison(field, op, literal), i + 1
+
+    predicate, end = expression(0)
+    if end != len(tokens):
+        raise ValueError("Unbalanced parentheses in WHERE clause")
+    return predicate
+
+
+def comparison(field, op, literal):
+    if literal.lower() == "null":
+        is_null = (lambda record: record.get(field) in (None, ""))
+        return is_null if op == "=" else (lambda record: not is_null(record))
+    quoted = literal.startswith("'")
+    value = literal[1:-1] if quoted else literal.lower()
+    compare = COMPARE[op]
+
+    def matches(record):
+        actual = record.get(field)
+        actual = "" if actual is None else str(actual)
+        return compare(actual if quoted else actual.lower(), value)
+    return matches
+
+
+def run_query(records, fields, predicate, order=()):
+    matched = [record for record in records if predicate(record)]
+    # Stable sorts from the last key to the first give the combined order
+    for field, descending in reversed(order):
+        matched.sort(key=lambda record: "" if record.get(field) is None else str(record[field]), reverse=descending)
+    return [{key: record[source] for source, key in fields if source in record} for record in matched]
+
+
+# ─── Simulated Vault ───────────────────────────────────────
+class VaultSimulator:
+    """In-memory stand-in for the CTMS and CDMS Vault endpoints the sync scripts call.
+
+    Both vaults are served from one dataset, a dict of Vault object name to
+    records (e.g. study__v, study_person__clin, users, site__v). Every
+    response waits latency ± jitter seconds and carries the burst/daily limit
+    headers RateLimiter reads; exceeding the burst limit answers 429. The
+    *_rate arguments inject faults with the given probability per request:
+    401 INVALID_SESSION_ID (the session is revoked), 429 with Retry-After,
+    and 503. Study creation is asynchronous like in Vault: a created study
+    master only shows up in listings create_delay seconds later.
+    """
+
+    def __init__(self, data=None, host=SIM_HOST, port=SIM_PORT, page_size=SIM_PAGE_SIZE, latency=SIM_LATENCY,
+                 jitter=SIM_JITTER, create_delay=SIM_CREATE_DELAY, burst_limit=SIM_BURST_LIMIT,
+                 burst_window=SIM_BURST_WINDOW, daily_limit=SIM_DAILY_LIMIT, invalid_session_rate=0.0,
+                 throttle_rate=0.0, error_rate=0.0, seed=None):
+        self.data = {name: list(records) for name, records in (data or {}).items()}
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.create_delay = create_delay
+        self.burst_limit = burst_limit
+        self.burst_window = burst_window
+        self.daily_limit = daily_limit
+        self.invalid_session_rate = invalid_session_rate
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.sessions = {}
+        self.queries = {}
+        self.study_masters = []
+        self.stats = {"requests": 0, "invalid_session": 0, "throttled": 0, "errors": 0}
+        self._calls = deque()
+        self._daily_calls = 0
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), SimulatorHandler)
+        self.server.daemon_threads = True
+        self.server.simulator = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve on a background thread and return the base URL to use as CTMS_URL / BASE_URL."""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="vault-simulator", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ─── Limits and Fault Injection ────────────────────────
+    def admit(self, session_id):
+        """Count one request and return (status, error type, message) if it must be refused, else None."""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] > self.burst_window:
+                self._calls.popleft()
+            self._calls.append(now)
+            self._daily_calls += 1
+
+            if len(self._calls) > self.burst_limit or self._daily_calls > self.daily_limit:
+                self.stats["throttled"] += 1
+                return 429, "API_LIMIT_EXCEEDED", "API limit exceeded."
+            if session_id is not None:
+                # Sessions younger than SESSION_GRACE are never revoked, so the
+                # threads retrying after a re-authentication all get through
+                issued_at = self.sessions.get(session_id)
+                expired = issued_at is None or (now - issued_at > SESSION_GRACE and self.random.random() < self.invalid_session_rate)
+                if expired:
+                    self.sessions.pop(session_id, None)
+                    self.stats["invalid_session"] += 1
+                    return 401, "INVALID_SESSION_ID", "Invalid or expired session ID."
+            if self.random.random() < self.throttle_rate:
+                self.stats["throttled"] += 1
+                return 429, "API_LIMIT_EXCEEDED", "API limit exceeded."
+            if self.random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 503, "SERVICE_UNAVAILABLE", "Service temporarily unavailable."
+        return None
+
+    def limit_headers(self):
+        with self._lock:
+            return {
+                "X-VaultAPI-BurstLimit": str(self.burst_limit),
+                RateLimiter.BURST_REMAINING_HEADER: str(max(0, self.burst_limit - len(self._calls))),
+                "X-VaultAPI-DailyLimit": str(self.daily_limit),
+                RateLimiter.DAILY_REMAINING_HEADER: str(max(0, self.daily_limit - self._daily_calls)),
+            }
+
+    def delay(self):
+        pause = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if pause > 0:
+            time.sleep(pause)
+
+    # ─── Endpoints ─────────────────────────────────────────
+    def authenticate(self, form):
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self.sessions[session_id] = time.monotonic()
+        return 200, {"responseStatus": "SUCCESS", "sessionId": session_id}
+
+    def start_query(self, version, form):
+        vql = (form.get("q") or [""])[0]
+        try:
+            object_name, fields, predicate, order = parse_query(vql)
+        except ValueError as e:
+            return 200, {"responseStatus": "FAILURE", "errors": [{"type": "MALFORMED_URL", "message": str(e)}]}
+        with self._lock:
+            rows = run_query(self.data.get(object_name, []), fields, predicate, order)
+            query_id = uuid.uuid4().hex
+            self.queries[query_id] = rows
+        return 200, self.query_page(version, query_id, 0)
+
+    def query_page(self, version, query_id, offset):
+        rows = self.queries.get(query_id)
+        if rows is None:
+            return {"responseStatus": "FAILURE", "errors": [{"type": "INVALID_DATA", "message": "Query expired."}]}
+        return SyntheticData.query_page(rows, offset, self.page_size, f"/api/{version}/query/{query_id}")
+
+    def list_study_masters(self, version, params):
+        name = (params.get("study_master_name") or [None])[0]
+        offset = int((params.get("offset") or [0])[0])
+        now = time.monotonic()
+        with self._lock:
+            masters = [master for ready_at, master in self.study_masters if ready_at <= now]
+        if name is not None:
+            masters = [master for master in masters if master["study_master_name"] == name]
+        page = masters[offset:offset + self.page_size]
+        details = {"limit": self.page_size, "offset": offset, "size": len(page), "total": len(masters)}
+        if offset + self.page_size < len(masters):
+            details["next_page"] = f"/api/{version}/app/cdm/design/study_masters?offset={offset + self.page_size}"
+        return 200, {"responseStatus": "SUCCESS", "responseDetails": details, "study_masters": page}
+
+    def create_study(self, payload):
+        name = payload.get("study_master_name")
+        if not name:
+            return 400, {"responseStatus": "FAILURE", "errors": [{"type": "PARAMETER_REQUIRED", "message": "study_master_name is required."}]}
+        with self._lock:
+            if any(master["study_master_name"] == name for _, master in self.study_masters):
+                return 400, {"responseStatus": "FAILURE", "errors": [{"type": "INVALID_DATA", "message": f"Study master '{name}' already exists."}]}
+            self.study_masters.append((time.monotonic() + self.create_delay, dict(payload)))
+        return 200, {"responseStatus": "SUCCESS", "job_id": uuid.uuid4().int % 10 ** 8}
+
+    def import_users_json(self, payload):
+        """Import every user or, when any of them is invalid, none of them."""
+        user_names = [str(user.get("User Name") or "").strip() for user in payload.get("users", [])]
+        if not all(user_names):
+            errors = [{"type": "INVALID_DATA", "message": "User Name is required."} for name in user_names if not name]
+            return 200, {"responseStatus": "FAILURE", "errors": errors}
+        for user_name in user_names:
+            self.add_user(user_name)
+        return 200, {"responseStatus": "SUCCESS", "users": [{"user_name": name, "responseStatus": "SUCCESS"} for name in user_names]}
+
+    def import_users_csv(self, body):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=["responseStatus", "id", "errors"])
+        writer.writeheader()
+        for row in csv.DictReader(io.StringIO(body.decode("utf-8-sig"))):
+            user_name = (row.get("user_name__v") or "").strip()
+            if not user_name:
+                writer.writerow({"responseStatus": "FAILURE", "errors": "PARAMETER_REQUIRED: user_name__v"})
+                continue
+            writer.writerow({"responseStatus": "SUCCESS", "id": self.add_user(user_name, row)})
+        return 200, buffer.getvalue()
+
+    def add_user(self, user_name, fields=None):
+        """Add (or update) a users record so later queries see it; returns its id."""
+        now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        with self._lock:
+            users = self.data.setdefault("users", [])
+            for user in users:
+                if user.get("user_name__v") == user_name:
+                    user.update(fields or {}, modified_date__v=now)
+                    return user["id"]
+            user = {**(fields or {}), "id": str(len(users) + 1), "user_name__v": user_name,
+                    "status__v": "active__v", "modified_date__v": now}
+            users.append(user)
+            return user["id"]
+
+
+# ─── HTTP Handler ──────────────────────────────────────────
+class SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method):
+        simulator = self.server.simulator
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        simulator.delay()
+
+        match = API_PATH.match(parts.path)
+        if match is None:
+            return self.reply(404, {"responseStatus": "FAILURE", "errors": [{"type": "NOT_FOUND", "message": parts.path}]})
+        version = parts.path.split("/")[2]
+        endpoint = match.group(1)
+
+        session_id = None
+        if endpoint != "/auth":
+            session_id = (self.headers.get("Authorization") or "").removeprefix("Bearer ").strip()
+        refused = simulator.admit(session_id)
+        if refused is not None:
+            status, error_type, message = refused
+            headers = {"Retry-After": SIM_RETRY_AFTER} if status == 429 else {}
+            return self.reply(status, {"responseStatus": "FAILURE", "errors": [{"type": error_type, "message": message}]}, headers)
+
+        try:
+            if method == "POST" and endpoint == "/auth":
+                status, payload = simulator.authenticate(parse_qs(body.decode()))
+            elif method == "POST" and endpoint == "/query":
+                status, payload = simulator.start_query(version, parse_qs(body.decode()))
+            elif method == "GET" and endpoint.startswith("/query/"):
+                offset = int((parse_qs(parts.query).get("pageoffset") or [0])[0])
+                status, payload = 200, simulator.query_page(version, endpoint.split("/")[2], offset)
+            elif method == "GET" and endpoint == "/app/cdm/design/study_masters":
+                status, payload = simulator.list_study_masters(version, parse_qs(parts.query))
+            elif method == "POST" and endpoint == "/app/cdm/design/actions/create_study":
+                status, payload = simulator.create_study(json.loads(body or b"{}"))
+            elif method == "POST" and endpoint == "/app/cdm/users_json":
+                status, payload = simulator.import_users_json(json.loads(body or b"{}"))
+            elif method == "POST" and endpoint == "/objects/users":
+                status, payload = simulator.import_users_csv(body)
+            else:
+                status, payload = 404, {"responseStatus": "FAILURE", "errors": [{"type": "NOT_FOUND", "message": parts.path}]}
+        except (ValueError, KeyError) as e:
+            status, payload = 400, {"responseStatus": "FAILURE", "errors": [{"type": "INVALID_DATA", "message": str(e)}]}
+        self.reply(status, payload)
+
+    def reply(self, status, payload, headers=None):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/csv; charset=UTF-8"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json;charset=UTF-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in {**self.server.simulator.limit_headers(), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ─── Standalone Server ─────────────────────────────────────
+def load_data(args):
+    """Records from the --data file, or a synthetic tenant generated from the size options."""
+    if not args.data:
+        return SyntheticData.from_arguments(args)
+    with open(args.data, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve a local Vault API stand-in. Point CTMS_URL and BASE_URL at the printed URL.",
+    )
+    parser.add_argument("--data", help="JSON file mapping Vault object names to lists of records (default: synthetic tenant)")
+    parser.add_argument("--host", default=SIM_HOST)
+    parser.add_argument("--port", type=int, default=SIM_PORT)
+    parser.add_argument("--page-size", type=int, default=SIM_PAGE_SIZE)
+    parser.add_argument("--latency", type=float, default=SIM_LATENCY, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=SIM_JITTER)
+    parser.add_argument("--create-delay", type=float, default=SIM_CREATE_DELAY, help="seconds before a created study is listed")
+    parser.add_argument("--burst-limit", type=int, default=SIM_BURST_LIMIT)
+    parser.add_argument("--daily-limit", type=int, default=SIM_DAILY_LIMIT)
+    parser.add_argument("--invalid-session-rate", type=float, default=0.0, help="probability of a 401 INVALID_SESSION_ID")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="probability of a 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 503")
+    SyntheticData.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    simulator = VaultSimulator(
+        load_data(args), args.host, args.port, args.page_size, args.latency, args.jitter, args.create_delay,
+        args.burst_limit, SIM_BURST_WINDOW, args.daily_limit, args.invalid_session_rate, args.throttle_rate,
+        args.error_rate, args.seed,
+    )
+    print(f"🧪 Vault simulator listening on {simulator.url}")
+    try:
+        simulator.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.server.server_close()
+        print(f"Requests served: {simulator.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,22 @@
-import json
-from dotenv import load_dotenv
-import requests
 import os
+import sys
+from dotenv import load_dotenv
+
+# bulkuser's .env is loaded before the shared Vault modules in the repo root read theirs
+load_dotenv()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+
+import json
+import VaultClient
+import VaultSession
+import ExtractIO
 import pandas as pd
 from io import StringIO 
 
-load_dotenv()
 API_VERSION = os.getenv("API_VERSION")
 BASE_URL = os.getenv("BASE_URL")
-# SESSION_ID = os.getenv("SESSION_ID")
-SESSION_FILE = "session_id.txt"
-with open(SESSION_FILE) as f:
-    SESSION_ID = f.read().strip()
-print(f"Session ID: {SESSION_ID}")
+SESSION = VaultSession.cdms()
+STUDY_SITE_PAIRS_CSV = "cdms_study_site_pairs.csv"
 
 # 
 def retrieve_CDMSStudy_Site_List():
@@ -22,34 +26,26 @@ def retrieve_CDMSStudy_Site_List():
         "Content-Type": "application/x-www-form-urlencoded",
         "Accept": "application/json",
         "X-VaultAPI-DescribeQuery": "true",
-        "Authorization": f"Bearer {SESSION_ID}"
     }
     payload = {
-        "q": "SELECT name__v, (SELECT name__v FROM sites__vr WHERE status__v = 'active__v') FROM study__v WHERE status__v = 'active__v'"
+        "q": "SELECT id, name__v, (SELECT name__v FROM sites__vr WHERE status__v = 'active__v') FROM study__v WHERE status__v = 'active__v'"
     }
 
-    url = base_url
-    while url:
-        response = requests.post(url, data=payload, headers=headers) if url == base_url else requests.get(url, headers=headers)
-        response.raise_for_status()
-        json_response = response.json()
+    for json_response in VaultClient.iter_query_pages(BASE_URL, base_url, headers, payload, session_manager=SESSION):
         # print(json.dumps(json_response, indent=4))  # Debug
 
         # Append studies from this page
         studies.extend(json_response.get("data", []))
 
-        # Get next page URL if present
-        next_page = json_response.get("responseDetails", {}).get("next_page")
-        if next_page:
-            # next_page is a relative URL, so prepend BASE_URL
-            url = BASE_URL + next_page
-            payload = None  # For GET requests, don't send payload
-        else:
-            url = None
-
     studies_df = pd.DataFrame(studies)
     print(f"Total studies retrieved: {len(studies_df)}")
-    studies_df.to_csv("cdms_study_Site_list.csv", index=False)
+    ExtractIO.write_extract([studies_df], "cdms_study_Site_list.csv")
+
+    # Normalized (study, site) pairs so consumers never re-parse the subquery column
+    if not studies_df.empty:
+        pairs_df = ExtractIO.flatten_subquery(studies_df, "sites__vr", "name__v", {"id": "study_id", "name__v": "study_name"}, "site_name")
+        ExtractIO.write_extract([pairs_df], STUDY_SITE_PAIRS_CSV)
+        print(f"Total study/site pairs written: {len(pairs_df)}")
     return studies_df
 
 retrieve_CDMSStudy_Site_List()
\ No newline at end of file
@@ -1,56 +1,31 @@
-import json
-from dotenv import load_dotenv
-import requests
 import os
-import pandas as pd
+import sys
+from dotenv import load_dotenv
 
+# bulkuser's .env is loaded before the shared Vault modules in the repo root read theirs
 load_dotenv()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+
+import DeltaSync
+import UserIndex
+import VaultSession
+
 API_VERSION = os.getenv("API_VERSION")
 BASE_URL = os.getenv("BASE_URL")
 study_name = os.getenv("Study_name")
-SESSION_FILE = "session_id.txt"
-with open(SESSION_FILE) as f:
-    SESSION_ID = f.read().strip()
-print(f"Session ID: {SESSION_ID}")
-
-def retrieve_CDMSusers():
-    users = []
-    base_url = f"{BASE_URL}/api/{API_VERSION}/query"
- 
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Accept": "application/json",
-        "X-VaultAPI-DescribeQuery": "true",
-        "Authorization": f"Bearer {SESSION_ID}"
-    }
-    payload = {
-        "q": "SELECT user_name__v, user_email__v   FROM users   "
-    }
-
-    url = base_url
-    while url:
-        response = requests.post(url, data=payload, headers=headers) if url == base_url else requests.get(url, headers=headers)
-        response.raise_for_status()
-        json_response = response.json()
-        print(json.dumps(json_response, indent=4))  # Debug
-
-        # Append studies from this page
-        users.extend(json_response.get("data", []))
-
-        # Get next page URL if present
-        next_page = json_response.get("responseDetails", {}).get("next_page")
-        if next_page:
-            # next_page is a relative URL, so prepend BASE_URL
-            url = BASE_URL + next_page
-            payload = None  # For GET requests, don't send payload
-        else:
-            url = None
-    users_df = pd.DataFrame(users)
-    print(f"Total users retrieved: {len(users_df)}")
-    users_df.to_csv("cdms_user_list.csv", index=False)
-    return users_df
-
-retrieve_CDMSusers()
+USER_FIELDS = ["user_name__v", "user_email__v"]
+SESSION = VaultSession.cdms()
+
+def retrieve_CDMSusers(full=False):
+    # Delta mode merges users modified since the last run into the existing snapshot
+    total = DeltaSync.sync("cdms_user_list", SESSION, "users", USER_FIELDS, "cdms_user_list.csv", active_only=False, full=full)
+    print(f"Total users retrieved: {total}")
+    if total:
+        UserIndex.build("cdms_user_list.csv")
+    return total
+
+if __name__ == "__main__":
+    retrieve_CDMSusers(full="--full" in sys.argv)
 
 
 
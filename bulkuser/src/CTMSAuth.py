@@ -1,53 +1,13 @@
 import os
+import sys
+import runpy
 from dotenv import load_dotenv
-from requests.auth import HTTPBasicAuth
-import requests
 
-load_dotenv()
-
-# Read environment variables
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-CTMS_API_VERSION = os.getenv("CTMS_API_VERSION")
-CTMS_URL = os.getenv("CTMS_URL")
-
-
-# Auth
-
-# Define the URL and headers
-url =  f"{CTMS_URL}/api/{CTMS_API_VERSION}/auth"
-headers = {
-    'Content-Type': 'application/x-www-form-urlencoded',
-    'Accept': 'application/json',
-}
-
-# Define the data
-data = {
-    'username': CLIENT_ID,
-    'password': CLIENT_SECRET
-}
-
-# Send the POST request
-response = requests.post(url, headers=headers, data=data)
-
-# Print the response
-print(f"Authentication response: " + str(response.json()))
-response_json = response.json()
-
-# Store the session ID
-if 'sessionId' in response_json:
-    session_id = response_json['sessionId']
-
-    # Use absolute path for shared session directory
-    session_dir = "."
-    try:
-        os.makedirs(session_dir, exist_ok=True)
-        session_file_path = os.path.join(session_dir, "CTMSsession_id.txt")
-        with open(session_file_path, "w") as f:
-            f.write(session_id)
-        print(f"Session ID saved successfully at {session_file_path}.")
-    except Exception as e:
-        print(f"Error saving session ID: {e}")
-else:
-    print("Error: 'sessionId' not found in the response.")
+# Runs the repo root's CTMSAuth.py; kept so the bulkuser command still works.
+# bulkuser's .env is loaded first so its settings take precedence.
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
 
+if __name__ == "__main__":
+    load_dotenv()
+    sys.path.append(ROOT_DIR)
+    runpy.run_path(os.path.join(ROOT_DIR, "CTMSAuth.py"), run_name="__main__")
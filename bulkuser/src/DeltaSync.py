@@ -0,0 +1,115 @@
+import os
+import sys
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+import VaultClient
+import ExtractIO
+import Metrics
+import PageCheckpoint
+import RedisStore
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+DELTA_SYNC = os.getenv("DELTA_SYNC", "true").lower() == "true"
+
+
+# ─── Watermarks (Redis) ────────────────────────────────────
+def watermark_key(name):
+    return f"delta:{name}:last_modified_date"
+
+
+def get_watermark(name):
+    try:
+        return RedisStore.get(watermark_key(name))
+    except Exception as e:
+        print(f"⚠️ Redis unavailable: {e}. Running a full scan.")
+        return None
+
+
+def set_watermark(name, value):
+    try:
+        RedisStore.set_many({watermark_key(name): value})
+        print(f"✅ Watermark for {name} set to {value}")
+    except Exception as e:
+        print(f"❌ Failed to update watermark for {name}: {e}")
+
+
+def load_snapshot(output_file):
+    """The existing extract if a delta can be merged into it (it has id and modified_date__v), else None."""
+    try:
+        snapshot = ExtractIO.read_extract(output_file, dtype=str)
+    except (OSError, ValueError):
+        return None
+    if "id" in snapshot.columns and "modified_date__v" in snapshot.columns:
+        return snapshot
+    return None
+
+
+# ─── Query ─────────────────────────────────────────────────
+def iter_records(session, query, checkpoint=None):
+    base_url = f"{session.vault_url}/api/{session.api_version}/query"
+    headers = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Accept": "application/json",
+        "X-VaultAPI-DescribeQuery": "true",
+    }
+    for json_response in VaultClient.iter_query_pages(session.vault_url, base_url, headers, {"q": query}, session_manager=session, checkpoint=checkpoint):
+        if "errors" in json_response:
+            raise RuntimeError(f"API returned an error: {json_response['errors']}")
+        yield from json_response.get("data", [])
+
+
+# ─── Delta Sync ────────────────────────────────────────────
+def sync(name, session, object_name, fields, output_file, active_only=True, full=False):
+    """Refresh the output_file snapshot of one Vault object and return its row count.
+
+    Without a watermark (first run, full=True, DELTA_SYNC off, or a snapshot
+    written before delta mode) the object is scanned in full and streamed to
+    output_file. Otherwise only records with modified_date__v at or after
+    the watermark are queried and upserted by id into the snapshot; records
+    that became inactive are dropped when active_only is set. Re-reading the
+    boundary timestamp is harmless because the merge is keyed on id.
+    """
+    snapshot = load_snapshot(output_file) if DELTA_SYNC and not full else None
+    watermark = get_watermark(name) if snapshot is not None else None
+
+    columns = ["id"] + fields + (["status__v"] if active_only else []) + ["modified_date__v"]
+    query = f"SELECT {', '.join(columns)} FROM {object_name}"
+    if watermark:
+        query += f" WHERE modified_date__v >= '{watermark}'"
+    elif active_only:
+        query += " WHERE status__v = 'active__v'"
+    # Checkpointed pages are only reusable if every run pages the rows in the same order
+    query += " ORDER BY id ASC"
+
+    checkpoint = PageCheckpoint.PageCheckpoint(name, query)
+    latest_dates = [watermark] if watermark else []
+
+    def tracked_chunks():
+        for chunk in ExtractIO.iter_record_chunks(iter_records(session, query, checkpoint)):
+            chunk = chunk.reindex(columns=columns)
+            latest_dates.append(chunk["modified_date__v"].dropna().max())
+            Metrics.records(name, len(chunk))
+            yield chunk
+
+    with Metrics.stage(name):
+        if watermark:
+            print(f"🔁 {name}: fetching changes since {watermark}")
+            changes = pd.concat(list(tracked_chunks()) or [pd.DataFrame(columns=columns)], ignore_index=True)
+            merged = pd.concat([snapshot, changes], ignore_index=True)
+            merged = merged.drop_duplicates("id", keep="last")
+            if active_only:
+                merged = merged[merged["status__v"] == "active__v"]
+            print(f"Changed records: {len(changes)}")
+            total = ExtractIO.write_extract([merged], output_file)
+        else:
+            print(f"📥 {name}: full scan")
+            total = ExtractIO.write_extract(tracked_chunks(), output_file)
+
+    latest = max((date for date in latest_dates if isinstance(date, str)), default=None)
+    if latest:
+        set_watermark(name, latest)
+    checkpoint.clear()
+    return total
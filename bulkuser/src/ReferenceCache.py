@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+import VaultClient
+import VaultSession
+
+# ─── Load Environment Variables ─────────────────────────────
+load_dotenv()
+CACHE_DIR = os.getenv("REFERENCE_CACHE_DIR", ".cache")
+USER_TTL = int(os.getenv("REFERENCE_USER_TTL", 10 * 60))
+STUDY_TTL = int(os.getenv("REFERENCE_STUDY_TTL", 60 * 60))
+
+# ─── Datasets ──────────────────────────────────────────────
+# Every dataset selects id and modified_date__v as well, and no status filter:
+# an incremental refresh has to see records that were made inactive.
+DATASETS = {
+    "cdms_users": {"vault": "cdms", "object": "users", "fields": ["user_name__v", "user_email__v", "status__v"], "ttl": USER_TTL},
+    "ctms_users": {"vault": "ctms", "object": "users", "fields": ["user_name__v", "user_email__v", "status__v"], "ttl": USER_TTL},
+    "cdms_studies": {"vault": "cdms", "object": "study__v", "fields": ["name__v", "status__v"], "ttl": STUDY_TTL},
+    "cdms_sites": {"vault": "cdms", "object": "site__v", "fields": ["name__v", "study__v", "status__v"], "ttl": STUDY_TTL},
+}
+VAULTS = {"cdms": VaultSession.cdms, "ctms": VaultSession.ctms}
+
+
+# ─── Reference Cache ───────────────────────────────────────
+class ReferenceCache:
+    """Study, site and user lists kept in a local SQLite file.
+
+    A dataset older than its TTL is refreshed incrementally: only records
+    with modified_date__v after the last one seen are queried and upserted
+    by id. A full reload replaces the table (use it to drop deleted records).
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "reference.db")
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS refresh_state (dataset TEXT PRIMARY KEY, refreshed_at REAL, watermark TEXT)")
+            for name, dataset in DATASETS.items():
+                columns = ", ".join(f"{field} TEXT" for field in dataset["fields"])
+                self._conn.execute(f"CREATE TABLE IF NOT EXISTS {name} (id TEXT PRIMARY KEY, {columns}, modified_date__v TEXT)")
+
+    def _state(self, name):
+        row = self._conn.execute("SELECT refreshed_at, watermark FROM refresh_state WHERE dataset = ?", (name,)).fetchone()
+        return row if row else (0.0, None)
+
+    def is_fresh(self, name):
+        refreshed_at, _ = self._state(name)
+        return time.time() - refreshed_at <= DATASETS[name]["ttl"]
+
+    def ensure_fresh(self, *names):
+        for name in names or DATASETS:
+            if not self.is_fresh(name):
+                self.refresh(name)
+
+    # ─── Refresh ───────────────────────────────────────────
+    def refresh(self, name, full=False):
+        """Pull changed records of one dataset from Vault and return how many were upserted.
+
+        Records modified at the watermark itself are pulled again, since others
+        may share its timestamp; the upsert by id makes that harmless.
+        """
+        dataset = DATASETS[name]
+        fields = ["id"] + dataset["fields"] + ["modified_date__v"]
+        _, watermark = self._state(name)
+        query = f"SELECT {', '.join(fields)} FROM {dataset['object']}"
+        if watermark and not full:
+            query += f" WHERE modified_date__v >= '{watermark}'"
+
+        session = VAULTS[dataset["vault"]]()
+        query_url = f"{session.vault_url}/api/{session.api_version}/query"
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json",
+        }
+        started_at = time.time()
+        rows = []
+        for page in VaultClient.iter_query_pages(session.vault_url, query_url, headers, {"q": query}, session_manager=session):
+            if "errors" in page:
+                raise RuntimeError(f"{name} refresh failed: {page['errors']}")
+            rows.extend(tuple(record.get(field) for field in fields) for record in page.get("data", []))
+
+        dates = [row[-1] for row in rows if row[-1]]
+        new_watermark = max(dates + ([watermark] if watermark and not full else []), default=None)
+        placeholders = ", ".join("?" for _ in fields)
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute(f"DELETE FROM {name}")
+            self._conn.executemany(f"INSERT OR REPLACE INTO {name} ({', '.join(fields)}) VALUES ({placeholders})", rows)
+            self._conn.execute("INSERT OR REPLACE INTO refresh_state VALUES (?, ?, ?)", (name, started_at, new_watermark))
+
+        print(f"🔄 {name}: {len(rows)} record(s) {'reloaded' if full else 'refreshed'} (watermark {new_watermark}).")
+        return len(rows)
+
+    # ─── Lookups ───────────────────────────────────────────
+    def user_names(self, name):
+        """Stripped user names of cdms_users or ctms_users."""
+        rows = self._conn.execute(f"SELECT user_name__v FROM {name} WHERE user_name__v IS NOT NULL").fetchall()
+        return {user_name.strip() for (user_name,) in rows}
+
+    def study_sites(self):
+        """Active (study, site) pairs; an active study without active sites has an empty site."""
+        query = """
+            SELECT TRIM(study.name__v) AS study, TRIM(COALESCE(site.name__v, '')) AS site
+            FROM cdms_studies AS study
+            LEFT JOIN cdms_sites AS site ON site.study__v = study.id AND site.status__v = 'active__v'
+            WHERE study.status__v = 'active__v'
+        """
+        return pd.read_sql_query(query, self._conn)
+
+    def close(self):
+        self._conn.close()
+
+
+# ─── Shared Cache ──────────────────────────────────────────
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def shared():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReferenceCache()
+        return _cache
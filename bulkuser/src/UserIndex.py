@@ -0,0 +1,88 @@
+import os
+import sys
+import hashlib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+import ExtractIO
+
+USER_NAME_FIELD = "user_name__v"
+
+
+# ─── Hashing ───────────────────────────────────────────────
+def hash_name(name):
+    """64-bit key of a stripped user name (collisions are negligible below billions of users)."""
+    return int.from_bytes(hashlib.blake2b(name.strip().encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash_names(names):
+    return np.fromiter((hash_name(name) for name in names), dtype=np.uint64)
+
+
+# ─── User Index ────────────────────────────────────────────
+class UserIndex:
+    """Sorted array of user-name hashes answering existence checks by binary search.
+
+    Indexes built by build() are stored as .npy files next to the extract and
+    opened memory-mapped, so only the pages a lookup touches are read.
+    """
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    @classmethod
+    def from_names(cls, names):
+        return cls(np.unique(hash_names(name if isinstance(name, str) else "" for name in names)))
+
+    @classmethod
+    def load(cls, index_file):
+        return cls(np.load(index_file, mmap_mode="r"))
+
+    def contains(self, names):
+        """Boolean array: which of names (stripped) are in the index."""
+        keys = hash_names(names)
+        if not len(self.hashes):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.searchsorted(self.hashes, keys)
+        found = positions < len(self.hashes)
+        found[found] = self.hashes[positions[found]] == keys[found]
+        return found
+
+    def __contains__(self, name):
+        return bool(self.contains([name])[0])
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+# ─── Build / Open On-Disk Indexes ──────────────────────────
+def index_path(extract_file):
+    return os.path.splitext(extract_file)[0] + ".idx.npy"
+
+
+def build(extract_file):
+    """Hash the user names of a user-list extract into its sorted on-disk index."""
+    try:
+        users_df = ExtractIO.read_extract(extract_file, columns=[USER_NAME_FIELD], dtype=str)
+        names = users_df[USER_NAME_FIELD]
+    except (ValueError, KeyError):
+        names = []
+    index = UserIndex.from_names(names)
+
+    index_file = index_path(extract_file)
+    tmp_file = f"{index_file}.tmp.npy"
+    np.save(tmp_file, index.hashes)
+    os.replace(tmp_file, index_file)
+    print(f"🗂️ Built user index {index_file} ({len(index)} users)")
+    return index_file
+
+
+def open_for(extract_file):
+    """The memory-mapped index of a user-list extract, rebuilt first if missing or older than the extract."""
+    source = ExtractIO.find_extract(extract_file)
+    if source is None:
+        raise FileNotFoundError(f"No extract found for {extract_file}")
+    index_file = index_path(extract_file)
+    if not os.path.exists(index_file) or os.path.getmtime(index_file) < os.path.getmtime(source):
+        build(extract_file)
+    return UserIndex.load(index_file)
@@ -1,37 +1,124 @@
 import os
-import requests
+import sys
 from dotenv import load_dotenv
 
-# Load environment variables
+# bulkuser's .env is loaded before the shared Vault modules in the repo root read theirs
 load_dotenv()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+
+import io
+import csv
+import itertools
+import requests
+import VaultClient
+import VaultSession
+import Profiling
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 API_VERSION = os.getenv("API_VERSION")
 BASE_URL = os.getenv("BASE_URL")
-SESSION_FILE = "session_id.txt"
-with open(SESSION_FILE) as f:
-    SESSION_ID = f.read().strip()
+BATCH_SIZE = int(os.getenv("USER_UPLOAD_BATCH_SIZE", 500))
+UPLOAD_WORKERS = int(os.getenv("USER_UPLOAD_WORKERS", 4))
+SESSION = VaultSession.cdms()
 
 # Paths
 dir = os.path.dirname(os.path.abspath(__file__))
 csv_file_path = os.path.join(dir, "user-import-template-24r2.csv")
+results_file_path = os.path.join(dir, "user-import-results.csv")
+RESULT_FIELDS = ["template_row", "responseStatus", "id", "errors"]
+
+
+# ─── Split the CSV into Batches ────────────────────────────
+def iter_csv_batches(file_path, batch_size=BATCH_SIZE):
+    """Yield (first_row, row_count, csv_bytes) per batch, each with the header repeated.
+
+    Rows are read with the csv module, so quoted values spanning lines stay
+    in one row; only one batch is held in memory at a time.
+    """
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        first_row = 2
+        while True:
+            rows = list(itertools.islice(reader, batch_size))
+            if not rows:
+                return
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(header)
+            writer.writerows(rows)
+            yield first_row, len(rows), buffer.getvalue().encode("utf-8")
+            first_row += len(rows)
+
+
+# ─── Upload One Batch ──────────────────────────────────────
+def upload_batch(batch, session=SESSION):
+    """POST one CSV batch to /objects/users and return (first_row, row_count, per-row result dicts)."""
+    first_row, row_count, data = batch
+    url = f"{BASE_URL}/api/{API_VERSION}/objects/users"
+    headers = {
+        "Accept": "text/csv",
+        "Content-Type": "text/csv",
+    }
+    try:
+        response = VaultClient.post(url, headers=headers, data=data, session_manager=session)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as err:
+        print(f"❌ Rows {first_row}-{first_row + row_count - 1}: upload failed: {err}")
+        return first_row, row_count, [{"responseStatus": "FAILURE", "errors": str(err)}] * row_count
+
+    print(f"✅ Rows {first_row}-{first_row + row_count - 1}: uploaded.")
+    return first_row, row_count, list(csv.DictReader(io.StringIO(response.text)))
+
+
+# ─── Parallel Upload with Merged Results ───────────────────
+@Profiling.profiled("import-users")
+def import_users(file_path=csv_file_path, results_path=results_file_path, batch_size=BATCH_SIZE, max_workers=UPLOAD_WORKERS):
+    """Upload the CSV in batches on a thread pool and merge the per-row results in file order.
+
+    At most 2 * max_workers batches are read ahead, and each batch's result
+    rows are written to results_path as soon as it and every earlier batch
+    are done. Returns (succeeded, failed) row counts.
+    """
+    batches = iter_csv_batches(file_path, batch_size)
+    in_flight = deque()
+    succeeded = failed = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            open(results_path, "w", newline="", encoding="utf-8") as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+
+        def write_result(result):
+            nonlocal succeeded, failed
+            first_row, row_count, result_rows = result
+            for offset, row in enumerate(result_rows):
+                writer.writerow({**row, "template_row": first_row + offset})
+                if row.get("responseStatus") == "SUCCESS":
+                    succeeded += 1
+                else:
+                    failed += 1
+            # Rows the response did not report on count as failures
+            failed += max(0, row_count - len(result_rows))
+            results_file.flush()
+
+        for batch in batches:
+            in_flight.append(executor.submit(upload_batch, batch))
+            if len(in_flight) >= 2 * max_workers:
+                write_result(in_flight.popleft().result())
+        while in_flight:
+            write_result(in_flight.popleft().result())
+
+    print(f"Import finished: {succeeded} succeeded, {failed} failed. Results: {results_path}")
+    return succeeded, failed
+
 
-# Prepare request
-url = f"{BASE_URL}/api/{API_VERSION}/objects/users"
-headers = {
-     "Accept": "application/json",
-    "Content-Type": "application/json",
-    "Authorization": f"Bearer {SESSION_ID}"
-}
-
-# Send POST request with CSV file as binary
-with open(csv_file_path, "rb") as file:
-    response = requests.post(url, headers=headers, data=file)
-
-# Check response
-try:
-    response.raise_for_status()
-    # print("Import successful.")
-    print(response.text)  # CSV response as text
-except requests.exceptions.HTTPError as err:
-    print("Import failed.")
-    print(err)
-    print(response.text)
+if __name__ == "__main__":
+    if "--profile" in sys.argv:
+        Profiling.enable()
+    succeeded, failed = import_users()
+    if failed:
+        exit(1)
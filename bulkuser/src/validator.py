@@ -1,74 +1,135 @@
 import os
+import sys
 import pandas as pd
-import ast
 
-def validate_import_template(template_path, data_dir):
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+import ExtractIO
+import Profiling
+import ReferenceCache
+import UserIndex
+
+STUDY_SITE_PAIRS_CSV = "cdms_study_site_pairs.csv"
+
+
+def _column(df, name):
+    """Stripped string column, or empty strings when the template lacks it."""
+    if name in df:
+        return df[name].str.strip()
+    return pd.Series("", index=df.index)
+
+
+def _parse_sites(sites_str):
+    try:
+        return [site.get("name__v", "").strip() for site in ExtractIO.parse_subquery(sites_str)]
+    except Exception:
+        return []
+
+
+def load_study_sites(data_dir):
+    """Normalized (study, site) table and the set of known studies.
+
+    Read from the study/site pairs written by CDMS_Study_site when present;
+    otherwise the sites__vr column of cdms_study_site_list.csv is parsed, a
+    study whose sites cannot be parsed is known but has no sites, and on
+    duplicate study rows the last one wins.
+    """
+    pairs_file = os.path.join(data_dir, STUDY_SITE_PAIRS_CSV)
+    if ExtractIO.find_extract(pairs_file):
+        pairs_df = ExtractIO.read_extract(pairs_file, dtype=str).fillna("")
+        study_sites = pd.DataFrame({"study": pairs_df["study_name"].str.strip(), "site": pairs_df["site_name"].str.strip()})
+    else:
+        study_site_df = ExtractIO.read_extract(os.path.join(data_dir, "cdms_study_site_list.csv"), dtype=str).fillna("")
+        studies = pd.DataFrame({
+            "study": study_site_df["name__v"].str.strip(),
+            "site": study_site_df["sites__vr"].map(_parse_sites),
+        }).drop_duplicates("study", keep="last")
+        study_sites = studies.explode("site").fillna({"site": ""})
+
+    known_studies = set(study_sites["study"])
+    study_sites = study_sites[study_sites["site"] != ""].drop_duplicates()
+    return study_sites, known_studies
+
+
+def load_user_index(data_dir, file_name):
+    """Memory-mapped user-existence index of a user-list extract, built next to it on first use."""
+    return UserIndex.open_for(os.path.join(data_dir, file_name))
+
+
+def find_missing_sites(df, study, site_access, study_sites):
+    """Per row, the str() of its requested sites that do not exist for its study ("" if none).
+
+    Site Access is exploded into one row per requested site and left-merged
+    against the study-site table; unmatched sites are kept as written in the
+    template (unstripped), in template order.
+    """
+    requested = pd.DataFrame({"row": df.index, "study": study, "piece": site_access.str.split(",")})
+    requested = requested[site_access != ""].explode("piece")
+    requested["site"] = requested["piece"].str.strip()
+    requested = requested[requested["site"] != ""]
+
+    merged = requested.merge(study_sites, on=["study", "site"], how="left", indicator=True)
+    missing = merged[merged["_merge"] == "left_only"]
+    return missing.groupby("row", sort=False)["piece"].agg(list).map(str).reindex(df.index, fill_value="").astype(str)
+
+
+def load_cached_reference_data(cache):
+    """Study-site table, known studies and user sets from the reference cache, refreshed if stale."""
+    cache.ensure_fresh("cdms_studies", "cdms_sites", "cdms_users", "ctms_users")
+    study_sites = cache.study_sites()
+    known_studies = set(study_sites["study"])
+    study_sites = study_sites[study_sites["site"] != ""].drop_duplicates()
+    cdms_users = UserIndex.UserIndex.from_names(cache.user_names("cdms_users"))
+    ctms_users = UserIndex.UserIndex.from_names(cache.user_names("ctms_users"))
+    return study_sites, known_studies, cdms_users, ctms_users
+
+
+@Profiling.profiled("validate")
+def validate_import_template(template_path, data_dir=None, cache=None):
+    """Validate a user import template against the reference data.
+
+    Reference data come from the extract CSVs in data_dir, or from the
+    local reference cache when no data_dir is given.
+    """
     df = pd.read_csv(template_path, dtype=str).fillna("")
+    return validate_import_frame(df, data_dir, cache)
 
-    # Load study-site mapping (study first, sites stringified)
-    study_site_df = pd.read_csv(os.path.join(data_dir, "cdms_study_site_list.csv"), dtype=str).fillna("")
-    # Build {study: set(sites)} lookup
-    study_site_lookup = {}
-    for _, row in study_site_df.iterrows():
-        study = row["name__v"].strip()
-        sites_str = row["sites__vr"]
-        try:
-            # Convert stringified list/dict to Python object
-            sites_dict = ast.literal_eval(sites_str)
-            site_names = set()
-            for site in sites_dict.get("data", []):
-                site_name = site.get("name__v", "").strip()
-                if site_name:
-                    site_names.add(site_name)
-            study_site_lookup[study] = site_names
-        except Exception as e:
-            study_site_lookup[study] = set()
-
-    # Load user lists for existence check
-    cdms_users_df = pd.read_csv(os.path.join(data_dir, "cdms_user_list.csv"), dtype=str).fillna("")
-    ctms_users_df = pd.read_csv(os.path.join(data_dir, "ctms_user_list.csv"), dtype=str).fillna("")
-    cdms_user_set = set(u.strip() for u in cdms_users_df["user_name__v"]) if "user_name__v" in cdms_users_df else set()
-    ctms_user_set = set(u.strip() for u in ctms_users_df["user_name__v"]) if "user_name__v" in ctms_users_df else set()
-
-    errors = []
-    valid_rows = []
-    for idx, row in df.iterrows():
-        user_key = row["User Name"].strip()
-        study = row.get("Study", "").strip()
-        site_access = row.get("Site Access", "").strip()
-
-        # Check study
-        if not study or study not in study_site_lookup:
-            errors.append(f"Row {idx+2}: Study '{study}' does not exist for user '{user_key}'.")
-            continue
-
-        # Check site(s) for this study
-        if site_access:
-            allowed_sites = study_site_lookup[study]
-            missing_sites = [site for site in site_access.split(",") if site.strip() and site.strip() not in allowed_sites]
-            if missing_sites:
-                errors.append(f"Row {idx+2}: Site(s) {missing_sites} do not exist for study '{study}' and user '{user_key}'.")
-                continue
-
-        # Check user existence
-        exists_in_cdms = user_key in cdms_user_set
-        exists_in_ctms = user_key in ctms_user_set
-        if exists_in_cdms and exists_in_ctms:
-            errors.append(f"Row {idx+2}: User '{user_key}' already exists in BOTH CDMS and CTMS.")
-            continue
-        elif exists_in_cdms:
-            errors.append(f"Row {idx+2}: User '{user_key}' already exists in CDMS.")
-            continue
-        elif exists_in_ctms:
-            errors.append(f"Row {idx+2}: User '{user_key}' already exists in CTMS.")
-            continue
-
-        valid_rows.append(row)
 
+def validate_import_frame(df, data_dir=None, cache=None):
+    """validate_import_template for import rows already in memory (all string columns, no NaN)."""
+    # Load study-site mapping and user lists for existence check
+    if data_dir is None:
+        study_sites, known_studies, cdms_users, ctms_users = load_cached_reference_data(cache or ReferenceCache.shared())
+    else:
+        study_sites, known_studies = load_study_sites(data_dir)
+        cdms_users = load_user_index(data_dir, "cdms_user_list.csv")
+        ctms_users = load_user_index(data_dir, "ctms_user_list.csv")
+
+    user_key = df["User Name"].str.strip()
+    study = _column(df, "Study")
+    site_access = _column(df, "Site Access")
+    row_label = "Row " + (df.index + 2).astype(str) + ": "
+
+    # Each row reports only its first failing check, in this order
+    study_missing = (study == "") | ~study.isin(known_studies)
+    missing_sites = find_missing_sites(df, study, site_access, study_sites)
+    sites_missing = ~study_missing & (missing_sites != "")
+    remaining = ~study_missing & ~sites_missing
+    exists_in_cdms = pd.Series(cdms_users.contains(user_key), index=df.index)
+    exists_in_ctms = pd.Series(ctms_users.contains(user_key), index=df.index)
+
+    messages = pd.Series(None, index=df.index, dtype=object)
+    messages[study_missing] = row_label + "Study '" + study + "' does not exist for user '" + user_key + "'."
+    messages[sites_missing] = (row_label + "Site(s) " + missing_sites + " do not exist for study '" + study
+                               + "' and user '" + user_key + "'.")
+    messages[remaining & exists_in_cdms & exists_in_ctms] = row_label + "User '" + user_key + "' already exists in BOTH CDMS and CTMS."
+    messages[remaining & exists_in_cdms & ~exists_in_ctms] = row_label + "User '" + user_key + "' already exists in CDMS."
+    messages[remaining & ~exists_in_cdms & exists_in_ctms] = row_label + "User '" + user_key + "' already exists in CTMS."
+
+    errors = messages.dropna().tolist()
     if errors:
         return False, errors, None
     else:
-        valid_df = pd.DataFrame(valid_rows)
+        valid_df = df[messages.isna()]
         return True, [], valid_df
 #  import os
 # import pandas as pd
@@ -1,22 +1,24 @@
 import os
+import sys
 import pandas as pd
-import ast
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+import ExtractIO
+import UserIndex
 
 def validate_import_template(template_path, data_dir):
     df = pd.read_csv(template_path, dtype=str).fillna("")
 
     # Load study-site mapping (study first, sites stringified)
-    study_site_df = pd.read_csv(os.path.join(data_dir, "cdms_study_site_list.csv"), dtype=str).fillna("")
+    study_site_df = ExtractIO.read_extract(os.path.join(data_dir, "cdms_study_site_list.csv"), dtype=str).fillna("")
     # Build {study: set(sites)} lookup
     study_site_lookup = {}
     for _, row in study_site_df.iterrows():
         study = row["name__v"].strip()
         sites_str = row["sites__vr"]
         try:
-            # Convert stringified list/dict to Python object
-            sites_dict = ast.literal_eval(sites_str)
             site_names = set()
-            for site in sites_dict.get("data", []):
+            for site in ExtractIO.parse_subquery(sites_str):
                 site_name = site.get("name__v", "").strip()
                 if site_name:
                     site_names.add(site_name)
@@ -24,11 +26,9 @@ def validate_import_template(template_path, data_dir):
         except Exception as e:
             study_site_lookup[study] = set()
 
-    # Load user lists for existence check
-    cdms_users_df = pd.read_csv(os.path.join(data_dir, "cdms_user_list.csv"), dtype=str).fillna("")
-    ctms_users_df = pd.read_csv(os.path.join(data_dir, "ctms_user_list.csv"), dtype=str).fillna("")
-    cdms_user_set = set(u.strip() for u in cdms_users_df["user_name__v"]) if "user_name__v" in cdms_users_df else set()
-    ctms_user_set = set(u.strip() for u in ctms_users_df["user_name__v"]) if "user_name__v" in ctms_users_df else set()
+    # Open the memory-mapped user indexes for existence check
+    cdms_user_set = UserIndex.open_for(os.path.join(data_dir, "cdms_user_list.csv"))
+    ctms_user_set = UserIndex.open_for(os.path.join(data_dir, "ctms_user_list.csv"))
 
     errors = []
     valid_rows = []
@@ -1,16 +1,155 @@
-# This is a sample Python script.
+import os
+import sys
+import argparse
 
-# Press Shift+F10 to execute it or replace it with your code.
-# Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
+import Metrics
+import Profiling
+import RedisStore
+import VaultSession
 
+# The validator and reference retrievers live in bulkuser/src and use the
+# shared Vault modules in the root, which come first on the path.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "bulkuser", "src"))
 
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print(f'Hi, {name}')  # Press Ctrl+F8 to toggle the breakpoint.
+STAGES = ["auth", "extract", "create-studies", "extract-persons", "validate", "import-users"]
 
 
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
+# ─── Stages ────────────────────────────────────────────────
+# Each stage takes the parsed arguments and the run context, a dict of the
+# DataFrames earlier stages produced, and returns False to stop the run.
+def skip(context, stage, message):
+    """Record a stage that had nothing to do because its upstream stage found no new records."""
+    print(f"✅ {message}")
+    context.setdefault("skipped", []).append(stage)
+    return True
 
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+
+def run_auth(args, context):
+    for name in args.vault:
+        try:
+            getattr(VaultSession, name)().refresh()
+        except Exception as e:
+            print(f"❌ {name.upper()} authentication failed: {e}")
+            return False
+    return True
+
+
+def run_extract(args, context):
+    import ClinicalStudyList
+    studies = ClinicalStudyList.main(keep=True)
+    if studies is False:
+        return False
+    context["studies"] = studies
+    if studies is not None:
+        Metrics.records("extract", len(studies))
+    return True
+
+
+def run_create_studies(args, context):
+    import CDMSstudyCreate
+    studies = context.get("studies")
+    if studies is None and "extract" in args.stages:
+        return skip(context, "create-studies", "No new studies to create.")
+    return CDMSstudyCreate.process_study_list(studies)
+
+
+def run_extract_persons(args, context):
+    import ClinicalStudyPerson
+    persons = ClinicalStudyPerson.main()
+    if persons is False:
+        return False
+    context["persons"] = persons
+    if persons is not None:
+        Metrics.records("extract-persons", len(persons))
+    return True
+
+
+def run_validate(args, context):
+    import validator
+    persons = context.get("persons")
+    if "extract-persons" not in args.stages:
+        is_valid, errors, valid_df = validator.validate_import_template(args.template, args.data_dir)
+    elif persons is None:
+        return skip(context, "validate", "No new users to validate.")
+    else:
+        # Only validate_import_template is profiled, so in-memory rows are profiled here
+        with Profiling.profile("validate"):
+            is_valid, errors, valid_df = validator.validate_import_frame(persons.fillna("").astype(str), args.data_dir)
+
+    if not is_valid:
+        print("Validation errors found:")
+        for err in errors:
+            print(err)
+        print("Fix the above issues before importing users.")
+        return False
+    print("All rows validated successfully.")
+    Metrics.records("validate", len(valid_df))
+    context["persons"] = valid_df
+    return True
+
+
+def run_import_users(args, context):
+    import ClindDataUserImport
+    persons = context.get("persons")
+    if persons is None and "extract-persons" in args.stages:
+        return skip(context, "import-users", "No new users to import.")
+    users = persons.fillna("").to_dict("records") if persons is not None else None
+    if users is not None:
+        Metrics.records("import-users", len(users))
+    return ClindDataUserImport.main(users)
+
+
+RUNNERS = {
+    "auth": run_auth,
+    "extract": run_extract,
+    "create-studies": run_create_studies,
+    "extract-persons": run_extract_persons,
+    "validate": run_validate,
+    "import-users": run_import_users,
+}
+
+
+# ─── Entry Point ───────────────────────────────────────────
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run CTMS → CDMS sync stages in one process. Stages always run in pipeline order "
+                    "and hand their DataFrames to the next stage instead of re-reading CSV files.",
+    )
+    parser.add_argument("stages", nargs="+", choices=STAGES, metavar="stage", help=f"one or more of: {', '.join(STAGES)}")
+    parser.add_argument("--vault", nargs="+", choices=["ctms", "cdms"], default=["ctms", "cdms"], help="vaults to authenticate (auth stage)")
+    parser.add_argument("--template", default=None, help="user import template to validate when no persons were extracted in this run")
+    parser.add_argument("--data-dir", default=None, help="directory with reference extracts (default: local reference cache)")
+    parser.add_argument("--profile", action="store_true", help="write cProfile and tracemalloc reports per stage to PROFILE_DIR")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.stages = [stage for stage in STAGES if stage in args.stages]
+    if args.profile:
+        Profiling.enable()
+    if args.template is None:
+        import ClindDataUserImport
+        args.template = ClindDataUserImport.TEMPLATE_PATH
+
+    # Both Vault sessions in one Redis round-trip; stages share them and the HTTP pool
+    try:
+        RedisStore.prefetch(*VaultSession.ctms().redis_keys(), *VaultSession.cdms().redis_keys())
+    except Exception as e:
+        print(f"⚠️ Redis unavailable: {e}")
+
+    context = {}
+    for stage in args.stages:
+        print(f"▶️ {stage}")
+        with Metrics.stage(stage):
+            ok = RUNNERS[stage](args, context)
+        if not ok:
+            print(f"⛔ Stopped after {stage}.")
+            return 1
+    if context.get("skipped"):
+        print(f"⏭️ Skipped with nothing new: {', '.join(context['skipped'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
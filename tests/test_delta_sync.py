@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import DeltaSync  # noqa: E402
+import ExtractIO  # noqa: E402
+from VaultSimulator import VaultSimulator  # noqa: E402
+
+
+def user(user_id, name, day, status="active__v"):
+    return {"id": user_id, "user_name__v": name, "status__v": status, "modified_date__v": f"2026-01-{day:02d}T00:00:00.000Z"}
+
+
+class SimulatorSession:
+    """Session manager holding one session issued by the simulator."""
+
+    def __init__(self, simulator):
+        _, payload = simulator.authenticate({})
+        self.session_id = payload["sessionId"]
+        self.vault_url = simulator.url
+        self.api_version = "v24.1"
+
+    def get_session_id(self):
+        return self.session_id
+
+    def refresh(self, stale_session_id=None):
+        return self.session_id
+
+
+@pytest.fixture
+def watermarks(tmp_path, monkeypatch):
+    """Watermarks kept in a dict instead of Redis; checkpoints land in tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(DeltaSync, "DELTA_SYNC", True)
+    store = {}
+    monkeypatch.setattr(DeltaSync, "get_watermark", store.get)
+    monkeypatch.setattr(DeltaSync, "set_watermark", store.__setitem__)
+    return store
+
+
+def test_delta_sync_upserts_changes_into_the_snapshot(tmp_path, watermarks):
+    output_file = str(tmp_path / "cdms_user_list.csv")
+    users = [
+        user("1", "alice@example.com", 1),
+        user("2", "bob@example.com", 2),
+        user("3", "carol@example.com", 3),
+        user("4", "dave@example.com", 1, status="inactive__v"),
+    ]
+    with VaultSimulator({"users": users}, port=0, latency=0, jitter=0) as sim:
+        session = SimulatorSession(sim)
+
+        # First run: full scan of the active users
+        assert DeltaSync.sync("cdms_users", session, "users", ["user_name__v"], output_file) == 3
+        assert watermarks["cdms_users"] == "2026-01-03T00:00:00.000Z"
+
+        records = sim.data["users"]
+        records[1].update(user("2", "bob.renamed@example.com", 4))
+        records[2].update(user("3", "carol@example.com", 5, status="inactive__v"))
+        records.append(user("5", "erin@example.com", 6))
+        # Written in the same instant as the watermark, after the first run read it
+        records.append(user("6", "frank@example.com", 3))
+
+        assert DeltaSync.sync("cdms_users", session, "users", ["user_name__v"], output_file) == 4
+
+    snapshot = ExtractIO.read_extract(output_file, dtype=str)
+    assert snapshot.set_index("id")["user_name__v"].to_dict() == {
+        "1": "alice@example.com",
+        "2": "bob.renamed@example.com",
+        "5": "erin@example.com",
+        "6": "frank@example.com",
+    }
+    assert watermarks["cdms_users"] == "2026-01-06T00:00:00.000Z"
+
+
+def test_full_sync_ignores_the_watermark(tmp_path, watermarks):
+    output_file = str(tmp_path / "cdms_user_list.csv")
+    watermarks["cdms_users"] = "2026-01-05T00:00:00.000Z"
+    ExtractIO.write_extract([pd.DataFrame([user("9", "old@example.com", 5)])], output_file)
+
+    with VaultSimulator({"users": [user("1", "alice@example.com", 1)]}, port=0, latency=0, jitter=0) as sim:
+        assert DeltaSync.sync("cdms_users", SimulatorSession(sim), "users", ["user_name__v"], output_file, full=True) == 1
+
+    snapshot = ExtractIO.read_extract(output_file, dtype=str)
+    assert snapshot["id"].tolist() == ["1"]
@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import ExtractIO  # noqa: E402
+
+
+def study_chunks():
+    """Two subquery pages: the first study has no sites, the second has one."""
+    first = pd.DataFrame({
+        "name__v": ["STUDY-1"],
+        "sites__vr": [{"responseDetails": {"total": 0}, "data": []}],
+    })
+    second = pd.DataFrame({
+        "name__v": ["STUDY-2"],
+        "sites__vr": [{"responseDetails": {"total": 1}, "data": [{"name__v": "S1"}]}],
+    })
+    return [first, second]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_subquery_columns_survive_every_format(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    output_file = str(tmp_path / "cdms_study_site_list.csv")
+
+    assert ExtractIO.write_extract(study_chunks(), output_file, fmt) == 2
+
+    df = ExtractIO.read_extract(output_file)
+    assert list(df["name__v"]) == ["STUDY-1", "STUDY-2"]
+    sites = [ExtractIO.parse_subquery(value) for value in df["sites__vr"]]
+    assert sites == [[], [{"name__v": "S1"}]]
+
+
+def test_subquery_to_json_leaves_scalar_columns():
+    df = pd.DataFrame({"name__v": ["A"], "sites__vr": [{"data": []}]})
+    converted = ExtractIO.subquery_to_json(df)
+    assert converted["name__v"].tolist() == ["A"]
+    assert json.loads(converted["sites__vr"].iloc[0]) == {"data": []}
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import PageCheckpoint  # noqa: E402
+import VaultClient  # noqa: E402
+from VaultSimulator import VaultSimulator  # noqa: E402
+
+QUERY = "SELECT id, user_name__v FROM users ORDER BY id ASC"
+
+
+def page(offset):
+    return {"responseDetails": {"pageoffset": offset}, "data": [{"id": str(offset)}]}
+
+
+def test_saved_pages_are_reused_by_the_same_query(tmp_path):
+    checkpoint = PageCheckpoint.PageCheckpoint("users", QUERY, str(tmp_path))
+    assert checkpoint.start(total=3000, pagesize=1000) == 0
+    checkpoint.save(1000, page(1000))
+
+    rerun = PageCheckpoint.PageCheckpoint("users", QUERY, str(tmp_path))
+    assert rerun.start(total=3000, pagesize=1000) == 1
+    assert rerun.load(1000) == page(1000)
+    assert rerun.load(2000) is None
+
+
+@pytest.mark.parametrize("total, pagesize", [(3001, 1000), (3000, 500)])
+def test_a_shifted_result_set_discards_the_checkpoint(tmp_path, total, pagesize):
+    checkpoint = PageCheckpoint.PageCheckpoint("users", QUERY, str(tmp_path))
+    checkpoint.start(total=3000, pagesize=1000)
+    checkpoint.save(1000, page(1000))
+
+    rerun = PageCheckpoint.PageCheckpoint("users", QUERY, str(tmp_path))
+    assert rerun.start(total=total, pagesize=pagesize) == 0
+    assert rerun.load(1000) is None
+
+
+def test_another_query_starts_fresh(tmp_path):
+    checkpoint = PageCheckpoint.PageCheckpoint("users", QUERY, str(tmp_path))
+    checkpoint.start(total=3000, pagesize=1000)
+    checkpoint.save(1000, page(1000))
+
+    other = PageCheckpoint.PageCheckpoint("users", QUERY.replace("ASC", "DESC"), str(tmp_path))
+    assert other.start(total=3000, pagesize=1000) == 0
+
+
+def test_query_resumes_after_a_partial_run(tmp_path):
+    users = [{"id": f"{i:03d}", "user_name__v": f"user{i}@example.com"} for i in range(50)]
+    with VaultSimulator({"users": users}, port=0, page_size=10, latency=0, jitter=0) as sim:
+        _, auth = sim.authenticate({})
+        headers = {"Authorization": f"Bearer {auth['sessionId']}"}
+
+        def run(pages=None):
+            checkpoint = PageCheckpoint.PageCheckpoint("users", QUERY, str(tmp_path))
+            query_pages = VaultClient.iter_query_pages(sim.url, f"{sim.url}/api/v24.1/query", headers, {"q": QUERY},
+                                                       max_workers=1, checkpoint=checkpoint)
+            records = []
+            for number, result_page in enumerate(query_pages, start=1):
+                records.extend(result_page["data"])
+                if number == pages:
+                    query_pages.close()
+                    break
+            return records
+
+        # Interrupted after the first page and two more
+        assert len(run(pages=3)) == 30
+        saved = len([name for name in os.listdir(tmp_path / os.listdir(tmp_path)[0]) if name.startswith("page_")])
+        assert saved >= 2
+
+        requests_before = sim.stats["requests"]
+        records = run()
+        # Only the query itself and the pages missing from the checkpoint are requested again
+        assert sim.stats["requests"] - requests_before == 1 + (4 - saved)
+        assert [record["id"] for record in records] == [user["id"] for user in users]
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import RateLimiter  # noqa: E402
+
+
+def headers(burst=None, daily=None):
+    values = {}
+    if burst is not None:
+        values[RateLimiter.BURST_REMAINING_HEADER] = str(burst)
+    if daily is not None:
+        values[RateLimiter.DAILY_REMAINING_HEADER] = str(daily)
+    return values
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter.RateLimiter(rate=RateLimiter.MIN_RATE)
+
+
+def test_full_rate_above_the_burst_reserve(limiter):
+    limiter.update(headers(burst=RateLimiter.BURST_RESERVE + 1, daily=RateLimiter.DAILY_RESERVE + 1))
+    assert limiter.rate == RateLimiter.MAX_RATE
+
+
+def test_spreads_the_rest_of_the_burst_below_the_reserve(limiter):
+    remaining = RateLimiter.BURST_RESERVE // 2
+    limiter.update(headers(burst=remaining))
+    assert limiter.rate == pytest.approx(max(RateLimiter.MIN_RATE, remaining / RateLimiter.BURST_WINDOW))
+    assert limiter.rate < RateLimiter.MAX_RATE
+
+
+def test_burst_rate_never_drops_below_the_minimum(limiter):
+    limiter.update(headers(burst=0))
+    assert limiter.rate == RateLimiter.MIN_RATE
+
+
+def test_minimum_rate_at_the_daily_reserve(limiter):
+    limiter.update(headers(burst=RateLimiter.BURST_RESERVE + 1, daily=RateLimiter.DAILY_RESERVE))
+    assert limiter.rate == RateLimiter.MIN_RATE
+
+    limiter.update(headers(burst=RateLimiter.BURST_RESERVE + 1, daily=RateLimiter.DAILY_RESERVE - 1))
+    assert limiter.rate == RateLimiter.MIN_RATE
+
+
+def test_responses_without_limit_headers_keep_the_rate(limiter):
+    limiter.update({})
+    assert limiter.rate == RateLimiter.MIN_RATE
+
+
+def test_concurrent_acquires_are_spaced_at_the_rate():
+    rate, callers = 20.0, 6
+    limiter = RateLimiter.RateLimiter(rate=rate, capacity=1)
+    waits = []
+    lock = threading.Lock()
+
+    def call():
+        wait = limiter.acquire()
+        with lock:
+            waits.append(wait)
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    # The first call uses the single token; every later one waits one interval more
+    waits.sort()
+    interval = 1 / rate
+    assert waits[0] == 0.0
+    for earlier, later in zip(waits, waits[1:]):
+        assert later - earlier == pytest.approx(interval, abs=interval / 2)
+    assert elapsed >= (callers - 1) * interval * 0.9
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import ClinicalStudyPerson  # noqa: E402
+
+
+class FakeSession:
+    def redis_keys(self):
+        return "CTMS:session_id", "CTMS:session_id:issued_at"
+
+    def get_session_id(self):
+        return "session"
+
+
+def person(email, modified_date):
+    return {
+        "email__clin": email, "name__v": email, "last_name__v": "Doe", "first_name__v": "Jo",
+        "person_type__cr.name__v": "External", "team_role__vr.name__v": "Study Nurse",
+        "site_connect_user__v": "false", "study__clinr.name__v": "STUDY-1", "study__clinr.status__v": "active__v",
+        "study_country__clinr.name__v": "Germany", "site__clinr.name__v": "S1", "start_date__clin": "2026-01-01",
+        "end_date__clin": "", "state__v": "active__v", "modified_date__v": modified_date,
+    }
+
+
+def test_watermark_advances_to_the_latest_raw_record(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stored = {}
+    monkeypatch.setattr(ClinicalStudyPerson.VaultSession, "ctms", FakeSession)
+    monkeypatch.setattr(ClinicalStudyPerson.RedisStore, "prefetch", lambda *keys: None)
+    monkeypatch.setattr(ClinicalStudyPerson.RedisStore, "set_many", stored.update)
+    monkeypatch.setattr(ClinicalStudyPerson, "get_last_modified_date", lambda: ClinicalStudyPerson.FALLBACK_DATE)
+    records = pd.DataFrame([person("a@example.com", "2026-02-03T10:00:00.000Z"), person("b@example.com", "2026-02-01T09:00:00.000Z")])
+    monkeypatch.setattr(ClinicalStudyPerson, "retrieve_Study_Person_details", lambda *args: records)
+
+    persons = ClinicalStudyPerson.main()
+
+    assert "modified_date__v" not in persons.columns
+    assert persons["User Name"].tolist() == ["a@example.com", "b@example.com"]
+    assert stored == {ClinicalStudyPerson.REDIS_MODIFIED_KEY: "2026-02-03T10:00:00.000Z"}
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import ClindDataUserImport  # noqa: E402
+from VaultSimulator import VaultSimulator  # noqa: E402
+
+
+class SimulatorSession:
+    """Session manager holding one session issued by the simulator."""
+
+    def __init__(self, simulator):
+        _, payload = simulator.authenticate({})
+        self.session_id = payload["sessionId"]
+
+    def get_session_id(self):
+        return self.session_id
+
+    def refresh(self, stale_session_id=None):
+        return self.session_id
+
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with VaultSimulator(port=0, latency=0, jitter=0) as sim:
+        monkeypatch.setattr(ClindDataUserImport, "BASE_URL", sim.url)
+        monkeypatch.setattr(ClindDataUserImport, "API_VERSION", "v24.1")
+        yield sim
+
+
+def test_bisecting_isolates_the_one_bad_user(simulator):
+    users = [{"User Name": f"user{i}@example.com", "Study": "STUDY-1"} for i in range(8)]
+    users[5]["User Name"] = ""
+
+    results = ClindDataUserImport.import_users(users, SimulatorSession(simulator), chunk_size=8, max_workers=1)
+
+    rows = pd.read_csv(ClindDataUserImport.RESULTS_CSV, keep_default_na=False)
+    assert rows[["first_row", "last_row", "users", "status"]].values.tolist() == [
+        [2, 5, 4, "SUCCESS"],
+        [6, 6, 1, "SUCCESS"],
+        [7, 7, 1, "FAILURE"],
+        [8, 9, 2, "SUCCESS"],
+    ]
+    assert "User Name is required." in rows.loc[2, "error"]
+    assert len(results) == len(rows)
+
+    imported = {user["user_name__v"] for user in simulator.data["users"]}
+    assert imported == {user["User Name"] for user in users if user["User Name"]}
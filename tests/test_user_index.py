@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import ExtractIO  # noqa: E402
+import UserIndex  # noqa: E402
+
+NAMES = ["alice@example.com", "bob@example.com", " carol@example.com "]
+
+
+def test_contains_hits_and_misses():
+    index = UserIndex.UserIndex.from_names(NAMES)
+
+    assert index.contains(["bob@example.com", "zoe@example.com"]).tolist() == [True, False]
+    assert "alice@example.com" in index
+    assert "zoe@example.com" not in index
+    assert len(index) == 3
+
+
+def test_surrounding_whitespace_is_ignored():
+    index = UserIndex.UserIndex.from_names(NAMES)
+
+    assert index.contains(["carol@example.com", "  alice@example.com\t"]).tolist() == [True, True]
+
+
+def test_case_is_significant():
+    # Same as the set lookups the index replaced: user names are compared exactly
+    index = UserIndex.UserIndex.from_names(NAMES)
+
+    assert index.contains(["Alice@example.com", "BOB@EXAMPLE.COM"]).tolist() == [False, False]
+
+
+def test_empty_index_contains_nothing():
+    index = UserIndex.UserIndex.from_names([])
+
+    assert index.contains(["alice@example.com"]).tolist() == [False]
+
+
+def test_open_for_builds_the_index_next_to_the_extract(tmp_path):
+    extract_file = str(tmp_path / "cdms_user_list.csv")
+    ExtractIO.write_extract([pd.DataFrame({"user_name__v": NAMES})], extract_file, "csv")
+
+    index = UserIndex.open_for(extract_file)
+
+    assert os.path.exists(UserIndex.index_path(extract_file))
+    assert index.contains(["carol@example.com", "dave@example.com"]).tolist() == [True, False]
@@ -0,0 +1,114 @@
+import ast
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import validator  # noqa: E402
+
+
+def iterrows_validate(template_path, data_dir):
+    """The row-by-row validator the vectorized one replaced, kept as the reference behaviour."""
+    df = pd.read_csv(template_path, dtype=str).fillna("")
+    study_site_df = pd.read_csv(os.path.join(data_dir, "cdms_study_site_list.csv"), dtype=str).fillna("")
+    study_site_lookup = {}
+    for _, row in study_site_df.iterrows():
+        study = row["name__v"].strip()
+        try:
+            sites = ast.literal_eval(row["sites__vr"])
+            study_site_lookup[study] = {s.get("name__v", "").strip() for s in sites.get("data", []) if s.get("name__v", "").strip()}
+        except Exception:
+            study_site_lookup[study] = set()
+
+    cdms_users_df = pd.read_csv(os.path.join(data_dir, "cdms_user_list.csv"), dtype=str).fillna("")
+    ctms_users_df = pd.read_csv(os.path.join(data_dir, "ctms_user_list.csv"), dtype=str).fillna("")
+    cdms_user_set = set(u.strip() for u in cdms_users_df["user_name__v"])
+    ctms_user_set = set(u.strip() for u in ctms_users_df["user_name__v"])
+
+    errors = []
+    valid_rows = []
+    for idx, row in df.iterrows():
+        user_key = row["User Name"].strip()
+        study = row.get("Study", "").strip()
+        site_access = row.get("Site Access", "").strip()
+        if not study or study not in study_site_lookup:
+            errors.append(f"Row {idx+2}: Study '{study}' does not exist for user '{user_key}'.")
+            continue
+        if site_access:
+            allowed_sites = study_site_lookup[study]
+            missing_sites = [site for site in site_access.split(",") if site.strip() and site.strip() not in allowed_sites]
+            if missing_sites:
+                errors.append(f"Row {idx+2}: Site(s) {missing_sites} do not exist for study '{study}' and user '{user_key}'.")
+                continue
+        exists_in_cdms = user_key in cdms_user_set
+        exists_in_ctms = user_key in ctms_user_set
+        if exists_in_cdms and exists_in_ctms:
+            errors.append(f"Row {idx+2}: User '{user_key}' already exists in BOTH CDMS and CTMS.")
+            continue
+        elif exists_in_cdms:
+            errors.append(f"Row {idx+2}: User '{user_key}' already exists in CDMS.")
+            continue
+        elif exists_in_ctms:
+            errors.append(f"Row {idx+2}: User '{user_key}' already exists in CTMS.")
+            continue
+        valid_rows.append(row)
+
+    if errors:
+        return False, errors, None
+    return True, [], pd.DataFrame(valid_rows)
+
+
+def sites(*names):
+    return str({"data": [{"name__v": name} for name in names]})
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    pd.DataFrame({
+        "name__v": ["STUDY-A", "STUDY-B", "STUDY-C", "STUDY-D"],
+        "sites__vr": [sites("101", "102"), sites("201"), sites(), "not a dict"],
+    }).to_csv(tmp_path / "cdms_study_site_list.csv", index=False)
+    pd.DataFrame({"user_name__v": ["both@x.com", "cdms@x.com"]}).to_csv(tmp_path / "cdms_user_list.csv", index=False)
+    pd.DataFrame({"user_name__v": ["both@x.com", "ctms@x.com"]}).to_csv(tmp_path / "ctms_user_list.csv", index=False)
+    return str(tmp_path)
+
+
+def write_template(tmp_path, rows):
+    path = tmp_path / "template.csv"
+    pd.DataFrame(rows, columns=["User Name", "Study", "Site Access"]).to_csv(path, index=False)
+    return str(path)
+
+
+def test_errors_match_iterrows_validator(tmp_path, data_dir):
+    template = write_template(tmp_path, [
+        ["new1@x.com", "STUDY-A", "101, 102"],
+        ["new2@x.com", "STUDY-X", "101"],
+        ["new3@x.com", "", ""],
+        ["new4@x.com", "STUDY-A", "101, 999 ,  ,888"],
+        ["new5@x.com", "STUDY-C", "301"],
+        ["new6@x.com", "STUDY-D", "401"],
+        [" both@x.com ", "STUDY-B", "201"],
+        ["cdms@x.com", "STUDY-B", ""],
+        ["ctms@x.com", "STUDY-A", "102"],
+        ["new7@x.com", "STUDY-D", ""],
+    ])
+
+    assert validator.validate_import_template(template, data_dir) == iterrows_validate(template, data_dir)
+
+
+def test_valid_df_matches_iterrows_validator(tmp_path, data_dir):
+    template = write_template(tmp_path, [
+        ["new1@x.com", "STUDY-A", "101, 102"],
+        ["new2@x.com", "STUDY-B", ""],
+        ["new3@x.com", " STUDY-C ", ""],
+    ])
+
+    ok, errors, valid_df = validator.validate_import_template(template, data_dir)
+    expected_ok, expected_errors, expected_df = iterrows_validate(template, data_dir)
+
+    assert (ok, errors) == (expected_ok, expected_errors) == (True, [])
+    pd.testing.assert_frame_equal(valid_df, expected_df, check_dtype=False)
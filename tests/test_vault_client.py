@@ -0,0 +1,141 @@
+import os
+import sys
+
+import pytest
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bulkuser", "src")]
+
+import RateLimiter  # noqa: E402
+import VaultClient  # noqa: E402
+
+URL = "https://vault.example.com/api/v24.1/vobjects/study__v"
+
+
+def make_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    return response
+
+
+class FakeSession:
+    """Answers each request with the next canned response."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(method)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff sleeps taken by _send; the rate limiter never waits."""
+    recorded = []
+    monkeypatch.setattr(VaultClient.time, "sleep", recorded.append)
+    monkeypatch.setattr(VaultClient.RateLimiter, "for_url", lambda url: RateLimiter.RateLimiter(rate=1000, capacity=1000))
+    return recorded
+
+
+def serve(monkeypatch, *responses):
+    session = FakeSession(*responses)
+    monkeypatch.setattr(VaultClient, "get_session", lambda url: session)
+    return session
+
+
+def test_post_is_not_retried_on_503(monkeypatch, sleeps):
+    session = serve(monkeypatch, make_response(503), make_response(200))
+
+    response = VaultClient.post(URL, json={})
+
+    assert response.status_code == 503
+    assert session.calls == ["POST"]
+    assert sleeps == []
+
+
+def test_idempotent_post_is_retried_on_503(monkeypatch, sleeps):
+    session = serve(monkeypatch, make_response(503), make_response(200))
+
+    response = VaultClient.post(URL, data={"q": "SELECT id FROM study__v"}, idempotent=True)
+
+    assert response.status_code == 200
+    assert session.calls == ["POST", "POST"]
+    assert len(sleeps) == 1
+
+
+def test_post_is_retried_on_429(monkeypatch, sleeps):
+    session = serve(monkeypatch, make_response(429, {"Retry-After": "2"}), make_response(200))
+
+    response = VaultClient.post(URL, json={})
+
+    assert response.status_code == 200
+    assert session.calls == ["POST", "POST"]
+    assert sleeps == [2.0]
+
+
+def test_retry_after_sets_the_delay(monkeypatch, sleeps):
+    serve(monkeypatch, make_response(503, {"Retry-After": "7"}), make_response(502, {"Retry-After": "0.5"}), make_response(200))
+
+    response = VaultClient.get(URL)
+
+    assert response.status_code == 200
+    assert sleeps == [7.0, 0.5]
+
+
+def test_backoff_without_retry_after_stays_within_bounds(monkeypatch, sleeps):
+    serve(monkeypatch, make_response(504), make_response(504), make_response(200))
+
+    VaultClient.get(URL)
+
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= VaultClient.BACKOFF_BASE
+    assert 0 <= sleeps[1] <= VaultClient.BACKOFF_BASE * 2
+
+
+def test_gives_up_after_max_retries(monkeypatch, sleeps):
+    monkeypatch.setattr(VaultClient, "MAX_RETRIES", 2)
+    session = serve(monkeypatch, *[make_response(503, {"Retry-After": "1"}) for _ in range(3)])
+
+    response = VaultClient.get(URL)
+
+    assert response.status_code == 503
+    assert len(session.calls) == 3
+    assert sleeps == [1.0, 1.0]
+
+
+def page_details(total, pagesize=1000, pageoffset=0, next_page="/api/v24.1/query/Q1?pagesize=1000&pageoffset=1000"):
+    return {"total": total, "pagesize": pagesize, "pageoffset": pageoffset, "next_page": next_page}
+
+
+def test_page_urls_cover_every_later_page():
+    urls = VaultClient.page_urls("https://vault.example.com", page_details(2500))
+
+    assert [VaultClient.page_offset(url) for url in urls] == [1000, 2000]
+    assert urls[-1] == "https://vault.example.com/api/v24.1/query/Q1?pagesize=1000&pageoffset=2000"
+
+
+def test_page_urls_stop_before_an_exact_multiple_of_the_page_size():
+    urls = VaultClient.page_urls("https://vault.example.com", page_details(3000))
+
+    assert [VaultClient.page_offset(url) for url in urls] == [1000, 2000]
+
+
+def test_page_urls_start_after_the_current_page():
+    urls = VaultClient.page_urls("https://vault.example.com", page_details(3500, pageoffset=1000))
+
+    assert [VaultClient.page_offset(url) for url in urls] == [2000, 3000]
+
+
+def test_page_urls_without_a_next_page():
+    assert VaultClient.page_urls("https://vault.example.com", page_details(500, next_page=None)) == []
+
+
+def test_page_urls_need_an_offset_to_derive_from():
+    details = page_details(2500, next_page="/api/v24.1/query/Q1?cursor=abc")
+    assert VaultClient.page_urls("https://vault.example.com", details) is None
+    assert VaultClient.page_urls("https://vault.example.com", page_details(0)) is None